@@ -15,6 +15,30 @@ class Sentence():
         """Returns a set of all symbols in the logical sentence."""
         return set()
 
+    def expression(self, index):
+        """Returns Python source evaluating the sentence in a model `m`,
+        an int whose bit `index[name]` is the value of each symbol."""
+        raise Exception("nothing to compile")
+
+    def evaluate_columns(self, columns):
+        """Evaluates the sentence in many models at once: `columns`
+        maps each symbol to a NumPy boolean array holding its value in
+        every model, and the result is a boolean array of the same
+        shape."""
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols=None):
+        """
+        Compiles the sentence to a single Python function of an integer
+        model, whose bit i is the value of the ith of `symbols` (sorted
+        symbol names by default). Returns (function, symbols).
+        """
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        index = {symbol: i for i, symbol in enumerate(symbols)}
+        function = eval(f"lambda m: bool({self.expression(index)})")
+        return function, list(symbols)
+
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
@@ -68,6 +92,15 @@ class Symbol(Sentence):
     def symbols(self):
         return {self.name}
 
+    def expression(self, index):
+        return f"(m >> {index[self.name]} & 1)"
+
+    def evaluate_columns(self, columns):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
 
 class Not(Sentence):
     def __init__(self, operand):
@@ -92,6 +125,12 @@ class Not(Sentence):
     def symbols(self):
         return self.operand.symbols()
 
+    def expression(self, index):
+        return f"(not {self.operand.expression(index)})"
+
+    def evaluate_columns(self, columns):
+        return ~self.operand.evaluate_columns(columns)
+
 
 class And(Sentence):
     def __init__(self, *conjuncts):
@@ -129,6 +168,19 @@ class And(Sentence):
     def symbols(self):
         return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
 
+    def expression(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            conjunct.expression(index) for conjunct in self.conjuncts
+        ) + ")"
+
+    def evaluate_columns(self, columns):
+        result = next(iter(columns.values())) | True
+        for conjunct in self.conjuncts:
+            result = result & conjunct.evaluate_columns(columns)
+        return result
+
 
 class Or(Sentence):
     def __init__(self, *disjuncts):
@@ -160,6 +212,19 @@ class Or(Sentence):
     def symbols(self):
         return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
 
+    def expression(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            disjunct.expression(index) for disjunct in self.disjuncts
+        ) + ")"
+
+    def evaluate_columns(self, columns):
+        result = next(iter(columns.values())) & False
+        for disjunct in self.disjuncts:
+            result = result | disjunct.evaluate_columns(columns)
+        return result
+
 
 class Implication(Sentence):
     def __init__(self, antecedent, consequent):
@@ -191,6 +256,15 @@ class Implication(Sentence):
     def symbols(self):
         return set.union(self.antecedent.symbols(), self.consequent.symbols())
 
+    def expression(self, index):
+        antecedent = self.antecedent.expression(index)
+        consequent = self.consequent.expression(index)
+        return f"(not {antecedent} or {consequent})"
+
+    def evaluate_columns(self, columns):
+        return (~self.antecedent.evaluate_columns(columns)
+                | self.consequent.evaluate_columns(columns))
+
 
 class Biconditional(Sentence):
     def __init__(self, left, right):
@@ -224,40 +298,435 @@ class Biconditional(Sentence):
     def symbols(self):
         return set.union(self.left.symbols(), self.right.symbols())
 
+    def expression(self, index):
+        left = self.left.expression(index)
+        right = self.right.expression(index)
+        return f"((not {left}) == (not {right}))"
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def evaluate_columns(self, columns):
+        return (self.left.evaluate_columns(columns)
+                == self.right.evaluate_columns(columns))
 
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+def model_check(knowledge, query):
+    """
+    Checks if knowledge base entails query: it does exactly when
+    knowledge and not query cannot both be true, which is checked
+    by converting them to CNF and running a SAT solver.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    return not satisfiable(cnf.clauses, cnf.count)
+
+
+# Answers of model_check_many
+YES = "YES"
+NO = "NO"
+MAYBE = "MAYBE"
+
+# Most symbols model_check_many enumerates every model of: beyond
+# this, one SAT call per query is faster than listing the models
+ENUMERATION_LIMIT = 10
+
+
+def model_check_many(knowledge, queries):
+    """
+    Classifies each of queries against knowledge base in one pass:
+    YES if knowledge entails it, NO if knowledge entails its negation,
+    MAYBE otherwise. Returns the answers in the order of queries.
+
+    The models of knowledge are enumerated once, with compiled
+    sentences, and each query is checked only against those models.
+    Beyond ENUMERATION_LIMIT symbols enumeration is slower than the
+    SAT solver, so each query and its negation are checked against a
+    single KnowledgeBase instead, which encodes knowledge once.
+    """
+    queries = list(queries)
+    symbols = sorted(set(knowledge.symbols()).union(
+        *(query.symbols() for query in queries)
+    ))
+
+    if len(symbols) > ENUMERATION_LIMIT:
+        kb = KnowledgeBase(knowledge)
+        return [
+            YES if kb.entails(query) else NO if kb.entails(Not(query)) else MAYBE
+            for query in queries
+        ]
+
+    holds, _ = knowledge.compile(symbols)
+    models = [m for m in range(2 ** len(symbols)) if holds(m)]
+    answers = []
+    for query in queries:
+        holds, _ = query.compile(symbols)
+        count = sum(1 for m in models if holds(m))
+        if count == len(models):
+            answers.append(YES)
+        elif count == 0:
+            answers.append(NO)
         else:
+            answers.append(MAYBE)
+    return answers
+
+
+def model_check_numpy(knowledge, query, chunk_symbols=20):
+    """
+    Checks if knowledge base entails query by evaluating both in every
+    model at once with NumPy, as whole boolean arrays with one row per
+    model, for knowledge bases of up to about 25 symbols.
+
+    Models are taken 2 ** chunk_symbols at a time, so memory stays
+    bounded however many symbols there are.
+    """
+    import numpy as np
+
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    total = 2 ** len(symbols)
+    size = min(total, 2 ** chunk_symbols)
+    offsets = np.arange(size, dtype=np.uint64)
+
+    for start in range(0, total, size):
+
+        # Row r of the chunk is model start + r: bit i is symbol i
+        rows = offsets + np.uint64(start)
+        columns = {
+            symbol: ((rows >> np.uint64(i)) & np.uint64(1)).astype(bool)
+            for i, symbol in enumerate(symbols)
+        }
+        if not columns:
+            columns = {None: np.ones(1, dtype=bool)}
+
+        # Entailment fails if any model has knowledge but not query
+        if np.any(knowledge.evaluate_columns(columns)
+                  & ~query.evaluate_columns(columns)):
+            return False
+    return True
+
+
+class CNF():
+    """
+    Conjunctive normal form of logical sentences, as a list of clauses
+    of integer literals: symbol i is literal i, its negation is -i.
+
+    Compound subformulas get a fresh variable of their own, with
+    clauses tying it to its operands (the Tseitin encoding), so the
+    clauses grow linearly with the sentences rather than exponentially.
+    The result is satisfiable exactly when the sentences are.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.clauses = []
+        self.literals = {}
+        self.count = 0
+
+    def variable(self, name=None):
+        """Returns the variable for symbol `name`, or a fresh one."""
+        if name is not None and name in self.variables:
+            return self.variables[name]
+        self.count += 1
+        if name is not None:
+            self.variables[name] = self.count
+        return self.count
+
+    def add(self, sentence):
+        """Adds clauses asserting that `sentence` is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append([self.literal(d) for d in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+
+        # A subformula used more than once is only encoded once; the
+        # sentence is kept alongside so its id cannot be reused
+        key = id(sentence)
+        if key in self.literals:
+            return self.literals[key][1]
+
+        if isinstance(sentence, And):
+            operands = [self.literal(c) for c in sentence.conjuncts]
+        elif isinstance(sentence, Or):
+            operands = [-self.literal(d) for d in sentence.disjuncts]
+        elif isinstance(sentence, Implication):
+            operands = [self.literal(sentence.antecedent),
+                        -self.literal(sentence.consequent)]
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            v = self.variable()
+            self.clauses.extend([[-v, -left, right], [-v, left, -right],
+                                 [v, left, right], [v, -left, -right]])
+            self.literals[key] = (sentence, v)
+            return v
+        else:
+            raise TypeError("must be a logical sentence")
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+        # v <=> all of operands (an Or or Implication is the negation
+        # of an And of negated operands)
+        v = self.variable()
+        for operand in operands:
+            self.clauses.append([-v, operand])
+        self.clauses.append([v] + [-operand for operand in operands])
+        if not isinstance(sentence, And):
+            v = -v
+        self.literals[key] = (sentence, v)
+        return v
+
+
+def satisfiable(clauses, count):
+    """
+    Returns True if the clauses over variables 1..count can all be
+    satisfied, using DPLL with clause learning: unit propagation over
+    two watched literals per clause, pure literal elimination up front,
+    and on each conflict a learned clause (first unique implication
+    point) with a backjump to the level where it becomes unit.
+    """
+    value = [0] * (count + 1)
+    level = [0] * (count + 1)
+    reason = [None] * (count + 1)
+    activity = [0.0] * (count + 1)
+    seen = [False] * (count + 1)
+    trail = []
+    trail_limits = []
+    watches = {}
+
+    def assign(literal, clause):
+        variable = abs(literal)
+        value[variable] = 1 if literal > 0 else -1
+        level[variable] = len(trail_limits)
+        reason[variable] = clause
+        trail.append(literal)
+
+    def truth(literal):
+        v = value[abs(literal)]
+        return v if literal > 0 else -v
+
+    def watch(clause):
+        watches.setdefault(clause[0], []).append(clause)
+        watches.setdefault(clause[1], []).append(clause)
+
+    # Simplify clauses and assign unit clauses
+    polarity = {}
+    pending = []
+    for clause in clauses:
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            continue
+        if not clause:
+            return False
+        for literal in clause:
+            polarity[abs(literal)] = polarity.get(abs(literal), 0) | (1 if literal > 0 else 2)
+        pending.append(clause)
+
+    clauses = []
+    for clause in pending:
+        if len(clause) == 1:
+            if truth(clause[0]) < 0:
+                return False
+            if truth(clause[0]) == 0:
+                assign(clause[0], clause)
+        else:
+            clauses.append(clause)
+            watch(clause)
+
+    # A variable that only ever appears one way can be set that way
+    for variable, signs in polarity.items():
+        if value[variable] == 0 and signs != 3:
+            assign(variable if signs == 1 else -variable, None)
+
+    head = 0
+
+    def propagate():
+        """Assigns implied literals, returning a conflicting clause or None."""
+        nonlocal head
+        while head < len(trail):
+            false = -trail[head]
+            head += 1
+            watching = watches.get(false, [])
+            kept = []
+            for i, clause in enumerate(watching):
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if truth(clause[0]) > 0:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if truth(clause[k]) >= 0:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if truth(clause[0]) < 0:
+                        kept.extend(watching[i + 1:])
+                        watches[false] = kept
+                        return clause
+                    assign(clause[0], clause)
+            watches[false] = kept
+        return None
+
+    def analyze(conflict):
+        """Returns the learned clause, asserting literal first, and the
+        level to backjump to."""
+        learned = [None]
+        pending = 0
+        literal = None
+        index = len(trail) - 1
+        clause = conflict
+        while True:
+            for q in clause if literal is None else clause[1:]:
+                variable = abs(q)
+                if not seen[variable] and level[variable] > 0:
+                    seen[variable] = True
+                    activity[variable] += 1
+                    if level[variable] == len(trail_limits):
+                        pending += 1
+                    else:
+                        learned.append(q)
+            while not seen[abs(trail[index])]:
+                index -= 1
+            literal = trail[index]
+            index -= 1
+            seen[abs(literal)] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = reason[abs(literal)]
+        learned[0] = -literal
+        for q in learned[1:]:
+            seen[abs(q)] = False
+
+        if len(learned) == 1:
+            return learned, 0
+        deepest = max(range(1, len(learned)), key=lambda k: level[abs(learned[k])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, level[abs(learned[1])]
+
+    def backjump(target):
+        nonlocal head
+        if len(trail_limits) > target:
+            start = trail_limits[target]
+            for literal in trail[start:]:
+                value[abs(literal)] = 0
+                reason[abs(literal)] = None
+            del trail[start:]
+            del trail_limits[target:]
+        head = len(trail)
+
+    while True:
+        conflict = propagate()
+        if conflict is not None:
+            if not trail_limits:
+                return False
+            learned, target = analyze(conflict)
+            backjump(target)
+            if len(learned) == 1:
+                assign(learned[0], None)
+            else:
+                watch(learned)
+                assign(learned[0], learned)
+        else:
+            # Decide the unassigned variable most involved in conflicts
+            variable = max(
+                (v for v in range(1, count + 1) if value[v] == 0),
+                key=activity.__getitem__, default=None
+            )
+            if variable is None:
+                return True
+            trail_limits.append(len(trail))
+            assign(-variable, None)
+
+
+class KnowledgeBase():
+    """
+    A knowledge base that grows one sentence at a time and answers
+    many entailment queries.
+
+    Sentences are hash-consed: every subformula is replaced by the one
+    shared object for its structure, and that object's symbols are
+    computed once. The CNF of the knowledge is extended as sentences
+    are added, and as shared subformulas are the same object, each is
+    encoded once however many sentences and queries contain it.
+    """
+
+    def __init__(self, *sentences):
+        self.nodes = {}
+        self.symbol_sets = {}
+        self.sentences = []
+        self.symbol_set = set()
+        self.cnf = CNF()
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds `sentence` to the knowledge base."""
+        sentence = self.intern(sentence)
+        self.sentences.append(sentence)
+        self.symbol_set |= self.symbol_sets[id(sentence)]
+        self.cnf.add(sentence)
+
+    def intern(self, sentence):
+        """Returns the shared sentence with the structure of `sentence`."""
+        if isinstance(sentence, Symbol):
+            key = ("symbol", sentence.name)
+        elif isinstance(sentence, Not):
+            operands = [self.intern(sentence.operand)]
+            key = ("not", id(operands[0]))
+        elif isinstance(sentence, And):
+            operands = [self.intern(c) for c in sentence.conjuncts]
+            key = ("and",) + tuple(id(c) for c in operands)
+        elif isinstance(sentence, Or):
+            operands = [self.intern(d) for d in sentence.disjuncts]
+            key = ("or",) + tuple(id(d) for d in operands)
+        elif isinstance(sentence, Implication):
+            operands = [self.intern(sentence.antecedent),
+                        self.intern(sentence.consequent)]
+            key = ("implication", id(operands[0]), id(operands[1]))
+        elif isinstance(sentence, Biconditional):
+            operands = [self.intern(sentence.left), self.intern(sentence.right)]
+            key = ("biconditional", id(operands[0]), id(operands[1]))
+        else:
+            raise TypeError("must be a logical sentence")
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+        node = self.nodes.get(key)
+        if node is not None:
+            return node
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+        # A new object, so adding to a caller's And cannot change it
+        if isinstance(sentence, Symbol):
+            node = Symbol(sentence.name)
+            symbols = frozenset([sentence.name])
+        else:
+            node = type(sentence)(*operands)
+            symbols = frozenset().union(
+                *(self.symbol_sets[id(operand)] for operand in operands)
+            )
+        self.nodes[key] = node
+        self.symbol_sets[id(node)] = symbols
+        return node
+
+    def symbols(self, sentence=None):
+        """Returns the symbols of `sentence`, or of the whole knowledge base."""
+        if sentence is None:
+            return set(self.symbol_set)
+        return set(self.symbol_sets[id(self.intern(sentence))])
+
+    def entails(self, query):
+        """
+        Checks if the knowledge base entails `query`, reusing the CNF
+        of the knowledge and of any subformulas seen before.
+        """
+        literal = self.cnf.literal(self.intern(query))
+        return not satisfiable(self.cnf.clauses + [[-literal]], self.cnf.count)
@@ -2,7 +2,22 @@
 
 
 import itertools
+import math
 import random
+import time
+
+from collections import deque
+
+# Components of more cells than this are sampled instead of counted
+ENUMERATION_LIMIT = 48
+
+# Most steps of the random walk that samples a component, and the
+# fewest, taken even once the time budget has run out
+SAMPLE_STEPS = 200000
+MIN_SAMPLE_STEPS = 256
+
+# Most component solutions the AI remembers
+SOLUTION_CACHE = 4096
 
 
 class Minesweeper():
@@ -162,12 +177,17 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, time_budget=0.1):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines, if known, and the time to spend
+        # working out which cell is safest when none is known safe
+        self.total_mines = mines
+        self.time_budget = time_budget
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -175,21 +195,34 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by their cells
+        self.sentences = {}
+
+        # Keys of the sentences that mention each cell
+        self.cell_sentences = {}
+
+        # Sentences added or changed since they were last examined
+        self.dirty = deque()
+        self.dirty_keys = set()
+
+        # Configuration counts of components, by their sentences, and
+        # estimates of those that were sampled rather than counted
+        self.solutions = {}
+
+    @property
+    def knowledge(self):
+        """List of sentences about the game known to be true."""
+        return list(self.sentences.values())
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        
         self.mines.add(cell)
-    
-        for sentence in self.knowledge:
-            if cell in sentence.cells:
-                sentence.cells.remove(cell)
-                sentence.count -= 1
+        for sentence in self.remove_sentences(cell):
+            sentence.mark_mine(cell)
+            self.store(sentence)
 
     def mark_safe(self, cell):
         """
@@ -197,11 +230,85 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-    
-        for sentence in self.knowledge:
-            if cell in sentence.cells:
-                sentence.cells.remove(cell)
-                
+        for sentence in self.remove_sentences(cell):
+            sentence.mark_safe(cell)
+            self.store(sentence)
+
+    def remove_sentences(self, cell):
+        """
+        Removes and returns the sentences that mention `cell`.
+        """
+        sentences = []
+        for key in self.cell_sentences.pop(cell, ()):
+            sentence = self.sentences.pop(key)
+            for other in key:
+                if other != cell:
+                    self.cell_sentences[other].discard(key)
+            sentences.append(sentence)
+        return sentences
+
+    def store(self, sentence):
+        """
+        Adds `sentence` to the knowledge, unless it is empty or already
+        known, and queues it to be examined.
+        """
+        key = frozenset(sentence.cells)
+        if not key or key in self.sentences:
+            return
+        self.sentences[key] = sentence
+        for cell in key:
+            self.cell_sentences.setdefault(cell, set()).add(key)
+        if key not in self.dirty_keys:
+            self.dirty_keys.add(key)
+            self.dirty.append(key)
+
+    def add_sentence(self, cells, count):
+        """
+        Adds the sentence that `count` of `cells` are mines, leaving out
+        cells already known to be mines or safe.
+        """
+        unknown = set()
+        for cell in cells:
+            if cell in self.mines:
+                count -= 1
+            elif cell not in self.safes:
+                unknown.add(cell)
+        self.store(Sentence(unknown, count))
+
+    def infer(self):
+        """
+        Examines queued sentences until none are left. A sentence whose
+        cells are all safe or all mines marks them, and a sentence whose
+        cells are a subset of another's gives a sentence for the rest.
+        Only sentences sharing a cell can be subsets of each other, so
+        only those are compared.
+        """
+        while self.dirty:
+            key = self.dirty.popleft()
+            self.dirty_keys.discard(key)
+            sentence = self.sentences.get(key)
+            if sentence is None:
+                continue
+
+            if sentence.count == 0:
+                for cell in key:
+                    self.mark_safe(cell)
+                continue
+            if sentence.count == len(key):
+                for cell in key:
+                    self.mark_mine(cell)
+                continue
+
+            others = set()
+            for cell in key:
+                others |= self.cell_sentences[cell]
+            others.discard(key)
+            for other_key in others:
+                other = self.sentences[other_key]
+                if key < other_key:
+                    self.add_sentence(other_key - key, other.count - sentence.count)
+                elif other_key < key:
+                    self.add_sentence(key - other_key, sentence.count - other.count)
 
     def add_knowledge(self, cell, count):
         """
@@ -218,15 +325,7 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        
-        # # Print current cell and count being processed
-        # print(f"Processing cell {cell} with count {count}")
 
-        # # Print current state of moves, safes, and mines
-        # print(f"Moves made: {self.moves_made}")
-        # print(f"Safes: {self.safes}")
-        # print(f"Mines: {self.mines}")
-        
         # Mark the cell as a move that has been made
         self.moves_made.add(cell)
 
@@ -234,47 +333,16 @@ class MinesweeperAI():
         self.mark_safe(cell)
 
         # Add a new sentence to the AI's knowledge base
-        new_cells = set()
+        neighbors = set()
         for i in range(cell[0] - 1, cell[0] + 2):
             for j in range(cell[1] - 1, cell[1] + 2):
-                neighbor = (i, j)
-                if 0 <= i < self.height and 0 <= j < self.width and neighbor != cell:
-                    if neighbor in self.mines:
-                        count -= 1  # Deduct from count if neighbor is a known mine
-                    elif neighbor not in self.safes:
-                        new_cells.add(neighbor)
-
-        if new_cells:
-            new_sentence = Sentence(new_cells, count)
-            if new_sentence not in self.knowledge:
-                self.knowledge.append(new_sentence)
-
-        # Mark any additional cells as safe or as mines based on the AI's knowledge base
-        made_inference = True
-        while made_inference:
-            made_inference = False
-            for sentence in self.knowledge.copy():
-                for cell in sentence.known_safes():
-                    if cell not in self.safes:
-                        self.mark_safe(cell)
-                        made_inference = True
-                for cell in sentence.known_mines():
-                    if cell not in self.mines:
-                        self.mark_mine(cell)
-                        made_inference = True
-
-        # Add any new sentences to the AI's knowledge base if they can be inferred from existing knowledge
-        new_knowledge = []
-        for set1 in self.knowledge:
-            for set2 in self.knowledge:
-                if set1.cells != set2.cells and set1.cells.issubset(set2.cells):
-                    new_cells = set2.cells - set1.cells
-                    new_count = set2.count - set1.count
-                    inferred_sentence = Sentence(new_cells, new_count)
-                    if inferred_sentence not in self.knowledge:
-                        new_knowledge.append(inferred_sentence)
-                        made_inference = True
-        self.knowledge += new_knowledge
+                if 0 <= i < self.height and 0 <= j < self.width and (i, j) != cell:
+                    neighbors.add((i, j))
+        self.add_sentence(neighbors, count)
+
+        # Mark cells and infer new sentences, re-examining only the
+        # sentences that were added or changed
+        self.infer()
 
     def make_safe_move(self):
         """
@@ -303,24 +371,294 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        the one least likely to be a mine, picking randomly among
+        cells that are equally likely.
         """
-        
-        available_moves = set()
-        
-        for i in range(self.height):
-            for j in range(self.width):
-                cell = (i, j)
-                if cell not in self.moves_made and cell not in self.mines:
-                    available_moves.add(cell)
-        
-        if len(available_moves) == 0:
+        probabilities = self.mine_probabilities()
+        if not probabilities:
             return None
-        
-        return random.choice(list(available_moves))
-        
-        
-        
-        #raise NotImplementedError
+
+        lowest = min(probabilities.values())
+        return random.choice(sorted(
+            cell for cell, p in probabilities.items() if p <= lowest + 1e-9
+        ))
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each cell not yet chosen, and not
+        known to be a mine, is a mine.
+
+        Cells in the knowledge are split into components that share no
+        sentence, and the mine configurations consistent with each
+        component are counted by number of mines. If the total number
+        of mines is known, every combination is weighted by the ways to
+        place the remaining mines in the cells outside all sentences.
+        Components not solved before share time_budget seconds evenly,
+        each counted within its share, or sampled for the rest of it
+        if it is too big or its time runs out. Either way the result is
+        kept for as long as the component stays unchanged.
+        """
+        deadline = time.perf_counter() + self.time_budget
+        unknown = {(i, j) for i in range(self.height) for j in range(self.width)}
+        unknown -= self.moves_made | self.mines
+        probabilities = {cell: 0.0 for cell in unknown & self.safes}
+
+        components = [(frozenset(c), c) for c in self.components()]
+        unsolved = sum(1 for key, _ in components if key not in self.solutions)
+
+        results = []
+        frontier = set()
+        for key, constraints in components:
+            result = self.solutions.get(key)
+            if result is None:
+                now = time.perf_counter()
+                until = now + max(0, deadline - now) / unsolved
+                unsolved -= 1
+                result = count_configurations(constraints, until)
+                if result is None:
+                    result = sample_configurations(constraints, until)
+                if len(self.solutions) >= SOLUTION_CACHE:
+                    self.solutions.clear()
+                self.solutions[key] = result
+            results.append(result)
+            for cells, _ in constraints:
+                frontier |= cells
+        interior = unknown - self.safes - frontier
+
+        remaining = None
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines)
+
+        # Number of mines in all components together, and the weight of
+        # a total once the rest are placed outside them
+        def combine(results):
+            distribution = [1]
+            for totals, _ in results:
+                combined = [0] * (len(distribution) + len(totals) - 1)
+                for s, a in enumerate(distribution):
+                    if a:
+                        for k, b in enumerate(totals):
+                            combined[s + k] += a * b
+                distribution = combined
+            return distribution
+
+        # Ways to place each number of mines outside the components
+        ways = [math.comb(len(interior), m) for m in range((remaining or 0) + 1)]
+
+        def placements(mines):
+            if mines < 0:
+                return 0
+            return ways[mines]
+
+        total = 0
+        if remaining is not None:
+            distribution = combine(results)
+            total = sum(w * placements(remaining - s) for s, w in enumerate(distribution))
+
+        if total:
+            for i, (totals, cell_counts) in enumerate(results):
+                others = combine(results[:i] + results[i + 1:])
+                weights = [
+                    sum(w * placements(remaining - k - s) for s, w in enumerate(others))
+                    for k in range(len(totals))
+                ]
+                for cell, counts in cell_counts.items():
+                    probabilities[cell] = sum(c * w for c, w in zip(counts, weights)) / total
+            if interior:
+                expected = sum(
+                    w * placements(remaining - s) * (remaining - s)
+                    for s, w in enumerate(distribution)
+                ) / total
+                for cell in interior:
+                    probabilities[cell] = expected / len(interior)
+        else:
+            # Without the mine count, components are independent, and
+            # cells outside them are taken to be as likely as the rest
+            for totals, cell_counts in results:
+                for cell, counts in cell_counts.items():
+                    probabilities[cell] = sum(counts) / sum(totals)
+            frontier_probabilities = [probabilities[cell] for cell in frontier]
+            density = (sum(frontier_probabilities) / len(frontier_probabilities)
+                       if frontier_probabilities else 0.5)
+            for cell in interior:
+                probabilities[cell] = density
+
+        return probabilities
+
+    def components(self):
+        """
+        Returns the knowledge split into independent components, each
+        a list of (cells, count) sentences, where sentences share cells
+        only with sentences of the same component.
+        """
+        parent = {}
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for cells in self.sentences:
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            first = find(next(iter(cells)))
+            for cell in cells:
+                root = find(cell)
+                if root != first:
+                    parent[root] = first
+
+        components = {}
+        for cells, sentence in self.sentences.items():
+            root = find(next(iter(cells)))
+            components.setdefault(root, []).append((cells, sentence.count))
+        return list(components.values())
+
+
+class SolveTimeout(Exception):
+    """Raised when counting configurations runs out of time."""
+
+
+def prepare(constraints):
+    """
+    Returns the cells of a component, ordered so each sentence is
+    completed as early as possible, and for each cell the indexes of
+    the constraints it is in.
+    """
+    cell_constraints = {}
+    for index, (cells, _) in enumerate(constraints):
+        for cell in cells:
+            cell_constraints.setdefault(cell, []).append(index)
+
+    # Breadth-first through sentences, starting from a corner of them
+    start = min(cell_constraints)
+    order = [start]
+    seen = {start}
+    queue = deque(order)
+    while queue:
+        cell = queue.popleft()
+        for index in cell_constraints[cell]:
+            for neighbor in sorted(constraints[index][0]):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    order.append(neighbor)
+                    queue.append(neighbor)
+    return order, [cell_constraints[cell] for cell in order]
+
+
+def count_configurations(constraints, deadline):
+    """
+    Counts the mine configurations of a component that satisfy all its
+    (cells, count) constraints, by backtracking. Returns (totals,
+    cell_counts), where totals[k] is the number of configurations with
+    k mines and cell_counts[cell][k] the number of those with a mine in
+    cell, or None if the component is too big or the deadline passes.
+    """
+    order, cell_constraints = prepare(constraints)
+    n = len(order)
+    if n > ENUMERATION_LIMIT:
+        return None
+
+    need = [count for _, count in constraints]
+    left = [len(cells) for cells, _ in constraints]
+    totals = [0] * (n + 1)
+    counts = [[0] * (n + 1) for _ in range(n)]
+    assignment = [0] * n
+    nodes = 0
+
+    def place(i, mines):
+        nonlocal nodes
+        nodes += 1
+        if nodes % 256 == 0 and time.perf_counter() > deadline:
+            raise SolveTimeout
+        if i == n:
+            totals[mines] += 1
+            for j in range(n):
+                if assignment[j]:
+                    counts[j][mines] += 1
+            return
+        for value in (0, 1):
+            consistent = True
+            for c in cell_constraints[i]:
+                left[c] -= 1
+                need[c] -= value
+                if need[c] < 0 or need[c] > left[c]:
+                    consistent = False
+            if consistent:
+                assignment[i] = value
+                place(i + 1, mines + value)
+            for c in cell_constraints[i]:
+                left[c] += 1
+                need[c] += value
+        assignment[i] = 0
+
+    try:
+        place(0, 0)
+    except SolveTimeout:
+        return None
+    return totals, dict(zip(order, counts))
+
+
+def sample_configurations(constraints, deadline):
+    """
+    Estimates count_configurations for a component too big to count,
+    by a random walk over configurations that flips one cell at a
+    time, preferring configurations that break fewer constraints, and
+    tallying those that break none. Takes MIN_SAMPLE_STEPS steps, and
+    more until the deadline passes, up to SAMPLE_STEPS.
+    """
+    order, cell_constraints = prepare(constraints)
+    n = len(order)
+    counts_needed = [count for _, count in constraints]
+
+    # Start from mines spread as evenly as the constraints suggest
+    assignment = []
+    for i in range(n):
+        density = min(
+            counts_needed[c] / len(constraints[c][0]) for c in cell_constraints[i]
+        )
+        assignment.append(1 if random.random() < density else 0)
+    sums = [0] * len(constraints)
+    for i in range(n):
+        if assignment[i]:
+            for c in cell_constraints[i]:
+                sums[c] += 1
+    broken = sum(abs(sums[c] - counts_needed[c]) for c in range(len(constraints)))
+    mines = sum(assignment)
+
+    totals = [0] * (n + 1)
+    counts = [[0] * (n + 1) for _ in range(n)]
+    steps = 0
+    while steps < SAMPLE_STEPS and (
+        steps < MIN_SAMPLE_STEPS or steps % 16 or time.perf_counter() < deadline
+    ):
+        steps += 1
+        i = random.randrange(n)
+        change = 1 - 2 * assignment[i]
+        delta = 0
+        for c in cell_constraints[i]:
+            delta += abs(sums[c] + change - counts_needed[c]) - abs(sums[c] - counts_needed[c])
+        if delta <= 0 or random.random() < math.exp(-2 * delta):
+            assignment[i] += change
+            mines += change
+            broken += delta
+            for c in cell_constraints[i]:
+                sums[c] += change
+        if broken == 0:
+            totals[mines] += 1
+            for j in range(n):
+                if assignment[j]:
+                    counts[j][mines] += 1
+
+    # With no consistent configuration seen, fall back on the densities
+    if not any(totals):
+        totals[mines] = 1
+        for j in range(n):
+            density = min(
+                counts_needed[c] / len(constraints[c][0]) for c in cell_constraints[j]
+            )
+            counts[j][mines] = density
+    return totals, dict(zip(order, counts))
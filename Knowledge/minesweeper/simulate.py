@@ -0,0 +1,109 @@
+import random
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Option names and their defaults
+OPTIONS = {
+    "--height": 16,
+    "--width": 30,
+    "--mines": 99,
+    "--seed": 0,
+    "--workers": 1,
+    "--budget": 0.1,
+}
+
+
+def main():
+    args = sys.argv[1:]
+    options = dict(OPTIONS)
+    for name, default in OPTIONS.items():
+        if name in args:
+            i = args.index(name)
+            try:
+                options[name] = type(default)(args[i + 1])
+            except (IndexError, ValueError):
+                sys.exit(f"{name} needs a number")
+            del args[i:i + 2]
+    if len(args) > 1:
+        sys.exit("Usage: python simulate.py [games] [--height H] [--width W] "
+                 "[--mines M] [--seed S] [--workers N] [--budget SECONDS]")
+    games = int(args[0]) if args else 100
+
+    height = options["--height"]
+    width = options["--width"]
+    mines = options["--mines"]
+    if not 0 < mines < height * width:
+        sys.exit("--mines must leave at least one safe cell")
+
+    start = time.perf_counter()
+    results = simulate(games, height, width, mines, options["--seed"],
+                       options["--workers"], options["--budget"])
+    elapsed = time.perf_counter() - start
+
+    wins = sum(won for won, _ in results)
+    latencies = sorted(latency for _, game in results for latency in game)
+    moves = len(latencies)
+    print(f"Games: {games} ({width}x{height}, {mines} mines)")
+    print(f"Won: {wins} ({100 * wins / games:.1f}%)")
+    print(f"Moves: {moves} in {elapsed:.2f}s ({moves / elapsed:.0f} moves/s)")
+    if latencies:
+        print(f"add_knowledge p50: {1000 * percentile(latencies, 50):.3f} ms, "
+              f"p99: {1000 * percentile(latencies, 99):.3f} ms")
+
+
+def simulate(games, height, width, mines, seed=0, workers=1, budget=0.1):
+    """
+    Plays `games` games, game i seeded with `seed` + i, spread across
+    `workers` processes. Returns (won, latencies) for each game in order.
+    """
+    seeds = range(seed, seed + games)
+    args = ([height] * games, [width] * games, [mines] * games, seeds, [budget] * games)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(play, *args, chunksize=max(1, games // (workers * 4))))
+    return list(map(play, *args))
+
+
+def play(height, width, mines, seed, budget=0.1):
+    """
+    Plays one game with the AI, making a safe move whenever one is known
+    and guessing otherwise. Returns whether every safe cell was revealed
+    without hitting a mine, and the time taken by each add_knowledge.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines, time_budget=budget)
+
+    latencies = []
+    safe_cells = height * width - mines
+    while len(ai.moves_made) < safe_cells:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+        if game.is_mine(move):
+            return False, latencies
+
+        nearby = game.nearby_mines(move)
+        start = time.perf_counter()
+        ai.add_knowledge(move, nearby)
+        latencies.append(time.perf_counter() - start)
+
+    return len(ai.moves_made) == safe_cells, latencies
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of sorted `values`, by nearest rank.
+    """
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import functools
+import codecs
+import itertools
+import json
+import os
+import select
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from graph import load_graph
+
+# Number of search trees each process keeps for repeated sources, by
+# default. A tree is two int32 arrays with one entry per person, so
+# 8 bytes a person: about 8 MB a tree on the large dataset, for each
+# of the --workers processes
+TREE_CACHE = 8
+
+# Most input lines answered together; fewer are when no more are ready
+CHUNK = 10000
+
+# Bytes read from an input file at a time
+READ_SIZE = 1 << 16
+
+# Graph loaded once per process, and its cached tree function
+graph = None
+tree_for = None
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--workers": 1, "--trees": TREE_CACHE}
+    for name in options:
+        if name in args:
+            i = args.index(name)
+            try:
+                options[name] = int(args[i + 1])
+            except (IndexError, ValueError):
+                sys.exit(f"{name} needs a number")
+            del args[i:i + 2]
+    if not 1 <= len(args) <= 2:
+        sys.exit("Usage: python batch.py directory [pairs] [--workers N] [--trees N]")
+    directory = args[0]
+    workers = options["--workers"]
+    trees = options["--trees"]
+
+    # Load (and snapshot) the graph once before any workers start,
+    # so each worker only has to memory-map the snapshot
+    load(directory, trees)
+
+    if len(args) == 2:
+        with open(args[1], encoding="utf-8") as f:
+            run(f, sys.stdout, directory, workers, trees)
+    else:
+        run(sys.stdin, sys.stdout, directory, workers, trees)
+
+
+def load(directory, trees=TREE_CACHE):
+    """
+    Loads the graph for this process, keeping up to `trees` search
+    trees for repeated sources.
+    """
+    global graph, tree_for
+    graph = load_graph(directory)
+    tree_for = functools.lru_cache(maxsize=trees)(graph.tree)
+
+
+def run(lines, out, directory, workers, trees=TREE_CACHE):
+    """
+    Answers each "source,target" line of `lines`, writing one JSON
+    result per line to `out` in input order, and skipping blank lines.
+    Lines are answered in chunks (see chunks), and the results of each
+    chunk are written as soon as it is answered.
+
+    Queries are grouped by source, so every group is answered from a
+    single search tree, and groups are spread across `workers`
+    processes which each map the same read-only graph and keep up to
+    `trees` search trees.
+    """
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=load, initargs=(directory, trees))
+        answer = executor.map
+    else:
+        executor = None
+        answer = map
+
+    try:
+        for chunk in chunks(lines):
+            groups = {}
+            for number, line in enumerate(chunk):
+                source, _, target = line.strip().partition(",")
+                groups.setdefault(source.strip(), []).append((number, target.strip()))
+
+            results = [None] * len(chunk)
+            for answers in answer(answer_group, groups.items()):
+                for number, result in answers:
+                    results[number] = result
+
+            for result in results:
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def chunks(lines, size=CHUNK):
+    """
+    Yields lists of up to `size` non-blank lines of `lines`.
+
+    Lines of a file are read as they arrive, and a list ends early
+    when no more input is ready, so input that arrives slowly, from a
+    pipe or a terminal, is answered as it comes rather than `size`
+    lines at a time. Other iterables are simply taken `size` at a time.
+    """
+    try:
+        fd = lines.fileno()
+    except (AttributeError, OSError):
+        fd = None
+    if fd is None or os.name != "posix":
+        lines = (line for line in lines if line.strip())
+        while True:
+            chunk = list(itertools.islice(lines, size))
+            if not chunk:
+                return
+            yield chunk
+
+    decoder = codecs.getincrementaldecoder(lines.encoding)()
+    pending = ""
+    chunk = []
+    while True:
+        if chunk and not select.select([fd], [], [], 0)[0]:
+            yield chunk
+            chunk = []
+
+        data = os.read(fd, READ_SIZE)
+        text = pending + decoder.decode(data, final=not data)
+        *complete, pending = text.split("\n")
+        if not data:
+            complete.append(pending)
+        chunk.extend(line for line in complete if line.strip())
+        while len(chunk) >= size:
+            yield chunk[:size]
+            chunk = chunk[size:]
+
+        if not data:
+            if chunk:
+                yield chunk
+            return
+
+
+def answer_group(group):
+    """
+    Answers every (number, target) query in `group` for one source,
+    returning (number, result) pairs.
+    """
+    source, queries = group
+    answers = []
+    for number, target in queries:
+        result = {"source": source, "target": target}
+        try:
+            tree = tree_for(resolve(source))
+            path = graph.path_in_tree(tree, resolve(target))
+        except LookupError as e:
+            result["error"] = str(e)
+        else:
+            if path is None:
+                result["degrees"] = None
+                result["path"] = None
+            else:
+                result["degrees"] = len(path)
+                result["path"] = path
+        answers.append((number, result))
+    return answers
+
+
+def resolve(person):
+    """
+    Returns the IMDB id for `person`, which may be an id or a
+    name that only one person has.
+    """
+    try:
+        graph.person_index(person)
+        return person
+    except KeyError:
+        pass
+    person_ids = graph.ids_for_name(person)
+    if len(person_ids) == 1:
+        return person_ids[0]
+    elif person_ids:
+        raise LookupError(f"ambiguous name: {person}")
+    raise LookupError(f"person not found: {person}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import load_graph
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -14,6 +15,9 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact Graph used instead of the dictionaries above, when loaded
+graph = None
+
 
 def load_data(directory):
     """
@@ -54,14 +58,31 @@ def load_data(directory):
                 pass
 
 
+def load_compact_data(directory):
+    """
+    Load data into a compact integer-indexed graph, memory-mapped from
+    the binary snapshot next to the CSV files, which is written first
+    if it is missing or older than them.
+    """
+    global graph
+    graph = load_graph(directory)
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = set(sys.argv[1:]) - set(args)
+    if len(args) > 1 or options - {"--bidirectional", "--compact", "--dicts"}:
+        sys.exit("Usage: python degrees.py [directory] [--bidirectional] [--dicts]")
+    directory = args[0] if len(args) == 1 else "large"
+    bidirectional = "--bidirectional" in options
 
-    # Load data from files into memory
+    # Load data from the snapshot, parsing the files only if it is
+    # missing or stale, or from files into dictionaries if asked
     print("Loading data...")
-    load_data(directory)
+    if "--dicts" in options:
+        load_data(directory)
+    else:
+        load_compact_data(directory)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -71,7 +92,10 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if bidirectional:
+        path = shortest_path_bidirectional(source, target)
+    else:
+        path = shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -80,9 +104,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = get_person(path[i][1])["name"]
+            person2 = get_person(path[i + 1][1])["name"]
+            movie = get_movie(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -93,6 +117,9 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
+    if graph is not None:
+        return graph.shortest_path(source, target)
+
     #state = person_id
     #action = movie_id
     #parent = previous node
@@ -100,7 +127,7 @@ def shortest_path(source, target):
 
     # Initialize frontier to just the starting position
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(start)
 
     # Initialize an empty explored set
@@ -137,18 +164,109 @@ def shortest_path(source, target):
                 child = Node(state=person_id, parent=node, action=movie_id)
                 frontier.add(child)
 
+
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both ends at once until the two searches meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to the (movie_id, person_id) step that reached it
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+
+        # Always grow the smaller side, it touches fewer people
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand_layer(forward_layer, forward, backward)
+        else:
+            backward_layer, meeting = expand_layer(backward_layer, backward, forward)
+
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    return None
+
+
+def expand_layer(layer, parents, other_parents):
+    """
+    Expands every person in `layer` by one step, recording parents.
+
+    Returns the next layer and the person where this search met the
+    other one, or None. The whole layer is expanded before choosing a
+    meeting point, so the path through it is guaranteed to be shortest.
+    """
+    next_layer = []
+    meeting = None
+    best = None
+    for person_id in layer:
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (movie_id, person_id)
+            next_layer.append(neighbor)
+            if neighbor in other_parents:
+                length = path_length(neighbor, parents) + path_length(neighbor, other_parents)
+                if best is None or length < best:
+                    best = length
+                    meeting = neighbor
+    return next_layer, meeting
+
+
+def path_length(person_id, parents):
+    """
+    Returns the number of steps from `person_id` back to its search root.
+    """
+    length = 0
+    while parents[person_id] is not None:
+        person_id = parents[person_id][1]
+        length += 1
+    return length
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Builds the (movie_id, person_id) path through the meeting person.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child = backward[person_id]
+        path.append((movie_id, child))
+        person_id = child
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if graph is not None:
+        person_ids = graph.ids_for_name(name)
+    else:
+        person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = get_person(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -168,6 +286,9 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors(person_id)
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -176,5 +297,23 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def get_person(person_id):
+    """
+    Returns the name and birth year for a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def get_movie(movie_id):
+    """
+    Returns the title and year for a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 if __name__ == "__main__":
     main()
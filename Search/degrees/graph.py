@@ -0,0 +1,402 @@
+import bisect
+import csv
+import mmap
+import os
+import struct
+
+from array import array
+
+# Binary snapshot written next to the CSV files by load_graph
+SNAPSHOT = "graph.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Written in native byte order, so a snapshot from another platform is rejected
+BYTE_ORDER_MARK = 0x01020304
+
+
+class Graph():
+    """
+    Compact co-star graph.
+
+    People and movies are interned to dense integer indexes, and the
+    person -> movies and movie -> stars relations are stored in
+    compressed sparse row form: the neighbours of row `i` are
+    `values[offsets[i]:offsets[i + 1]]`.
+
+    Ids and names are looked up by binary search over index arrays
+    sorted by that key, so no dictionaries are needed. All of the
+    arrays may equally be memoryviews over a memory-mapped snapshot.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_order, movie_order, name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+    def person_count(self):
+        return len(self.person_ids)
+
+    def person_index(self, person_id):
+        return find(self.person_order, self.person_ids.__getitem__, person_id)
+
+    def movie_index(self, movie_id):
+        return find(self.movie_order, self.movie_ids.__getitem__, movie_id)
+
+    def ids_for_name(self, name):
+        """
+        Returns the IMDB ids of everyone with the given name.
+        """
+        key = lambda i: self.person_names[i].lower()
+        name = name.lower()
+        lo = bisect.bisect_left(self.name_order, name, key=key)
+        hi = bisect.bisect_right(self.name_order, name, lo=lo, key=key)
+        return [self.person_ids[self.name_order[k]] for k in range(lo, hi)]
+
+    def person(self, person_id):
+        i = self.person_index(person_id)
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        i = self.movie_index(movie_id)
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        p = self.person_index(person_id)
+        for k in range(self.person_offsets[p], self.person_offsets[p + 1]):
+            m = self.person_movies[k]
+            for s in range(self.movie_offsets[m], self.movie_offsets[m + 1]):
+                neighbors.add((self.movie_ids[m], self.person_ids[self.movie_stars[s]]))
+        return neighbors
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, or None.
+        """
+        source = self.person_index(source)
+        target = self.person_index(target)
+        if source == target:
+            return []
+        parent, via = self.search(source, target)
+        if parent[target] == -1:
+            return None
+        return self.build_path(source, target, parent, via)
+
+    def tree(self, source):
+        """
+        Returns the full breadth-first search tree rooted at `source`,
+        from which path_in_tree can answer any target.
+        """
+        source = self.person_index(source)
+        parent, via = self.search(source)
+        return source, parent, via
+
+    def path_in_tree(self, tree, target):
+        """
+        Returns the shortest path from the root of `tree` to `target`,
+        or None if they are not connected.
+        """
+        source, parent, via = tree
+        target = self.person_index(target)
+        if parent[target] == -1:
+            return None
+        return self.build_path(source, target, parent, via)
+
+    def search(self, source, target=-1):
+        """
+        Breadth-first search over the integer arrays from person index
+        `source`, stopping early once `target` is reached.
+
+        Returns (parent, via) arrays giving the person and movie that
+        first reached each person, or -1 for people not reached. The
+        queue and the parent links are flat arrays, so no per-node
+        objects are created.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        parent = array("i", [-1]) * self.person_count()
+        via = array("i", [-1]) * self.person_count()
+        parent[source] = source
+
+        # Each movie only needs to be expanded once
+        seen_movies = bytearray(len(self.movie_ids))
+
+        queue = array("i", [source])
+        head = 0
+        while head < len(queue):
+            p = queue[head]
+            head += 1
+            for k in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[k]
+                if seen_movies[m]:
+                    continue
+                seen_movies[m] = 1
+                for s in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_stars[s]
+                    if parent[q] != -1:
+                        continue
+                    parent[q] = p
+                    via[q] = m
+                    if q == target:
+                        return parent, via
+                    queue.append(q)
+        return parent, via
+
+    def build_path(self, source, target, parent, via):
+        """
+        Follows parent links back from target to source.
+        """
+        path = []
+        p = target
+        while p != source:
+            path.append((self.movie_ids[via[p]], self.person_ids[p]))
+            p = parent[p]
+        path.reverse()
+        return path
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob,
+    where string `i` is `blob[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+def find(order, key, value):
+    """
+    Returns the index whose key equals `value`, using `order` which
+    lists indexes sorted by key. Raises KeyError if there is none.
+    """
+    k = bisect.bisect_left(order, value, key=key)
+    if k == len(order) or key(order[k]) != value:
+        raise KeyError(value)
+    return order[k]
+
+
+def sorted_order(n, key):
+    """
+    Returns an array of the indexes 0..n-1 sorted by key.
+    """
+    return array("i", sorted(range(n), key=key))
+
+
+def load_graph(directory, cache=True):
+    """
+    Load data from CSV files into a compact Graph.
+
+    If `cache` is true, a binary snapshot of the graph is kept next to
+    the CSV files and memory-mapped on later runs, as long as the CSV
+    files have not changed since it was written.
+    """
+    if cache:
+        key = snapshot_key(directory)
+        graph = read_snapshot(os.path.join(directory, SNAPSHOT), key)
+        if graph is not None:
+            return graph
+
+    graph = parse_graph(directory)
+
+    if cache:
+        try:
+            write_snapshot(os.path.join(directory, SNAPSHOT), key, graph)
+        except OSError:
+            pass
+    return graph
+
+
+def parse_graph(directory):
+    """
+    Parse the CSV files into a compact Graph.
+    """
+    person_ids = []
+    person_names = []
+    person_births = []
+    person_index = {}
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            person_index[row["id"]] = len(person_ids)
+            person_ids.append(row["id"])
+            person_names.append(row["name"])
+            person_births.append(row["birth"])
+
+    movie_ids = []
+    movie_titles = []
+    movie_years = []
+    movie_index = {}
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movie_index[row["id"]] = len(movie_ids)
+            movie_ids.append(row["id"])
+            movie_titles.append(row["title"])
+            movie_years.append(row["year"])
+
+    # Collect (person, movie) edges, skipping unknown ids and duplicates
+    edge_people = array("i")
+    edge_movies = array("i")
+    seen = set()
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            p = person_index.get(row["person_id"])
+            m = movie_index.get(row["movie_id"])
+            if p is None or m is None or (p, m) in seen:
+                continue
+            seen.add((p, m))
+            edge_people.append(p)
+            edge_movies.append(m)
+    del seen, person_index, movie_index
+
+    person_offsets, person_movies = build_csr(len(person_ids), edge_people, edge_movies)
+    movie_offsets, movie_stars = build_csr(len(movie_ids), edge_movies, edge_people)
+
+    return Graph(person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 sorted_order(len(person_ids), person_ids.__getitem__),
+                 sorted_order(len(movie_ids), movie_ids.__getitem__),
+                 sorted_order(len(person_ids), lambda i: person_names[i].lower()))
+
+
+def build_csr(rows, sources, targets):
+    """
+    Returns (offsets, values) arrays grouping `targets` by `sources`.
+    """
+    offsets = array("i", [0]) * (rows + 1)
+    for s in sources:
+        offsets[s + 1] += 1
+    for i in range(rows):
+        offsets[i + 1] += offsets[i]
+
+    values = array("i", [0]) * len(targets)
+    position = array("i", offsets)
+    for s, t in zip(sources, targets):
+        values[position[s]] = t
+        position[s] += 1
+    return offsets, values
+
+
+def snapshot_key(directory):
+    """
+    Returns the (mtime, size) of each CSV file, which a snapshot
+    must match to be used.
+    """
+    key = []
+    for filename in SNAPSHOT_SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.extend([stat.st_mtime_ns, stat.st_size])
+    return key
+
+
+# Order in which the graph's integer arrays and string tables are stored
+SNAPSHOT_ARRAYS = ["person_offsets", "person_movies", "movie_offsets", "movie_stars",
+                   "person_order", "movie_order", "name_order"]
+SNAPSHOT_STRINGS = ["person_ids", "person_names", "person_births",
+                    "movie_ids", "movie_titles", "movie_years"]
+SNAPSHOT_HEADER = struct.Struct(f"=8sII{2 * len(SNAPSHOT_SOURCES)}q")
+
+
+def write_snapshot(path, key, graph):
+    """
+    Writes the graph to `path` as a sequence of length-prefixed,
+    4-byte aligned sections. The file is written under a temporary
+    name and renamed, so readers never see a partial snapshot.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, BYTE_ORDER_MARK, *key))
+            for name in SNAPSHOT_ARRAYS:
+                write_section(f, array("i", getattr(graph, name)).tobytes())
+            for name in SNAPSHOT_STRINGS:
+                offsets = array("i", [0])
+                blob = bytearray()
+                for s in getattr(graph, name):
+                    blob += s.encode("utf-8")
+                    offsets.append(len(blob))
+                write_section(f, offsets.tobytes())
+                write_section(f, blob)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write_section(f, data):
+    f.write(struct.pack("=q", len(data)))
+    f.write(data)
+    f.write(b"\0" * (-len(data) % 4))
+
+
+def read_snapshot(path, key):
+    """
+    Returns the Graph memory-mapped from the snapshot at `path`,
+    or None if it is missing, stale or from an incompatible version.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    try:
+        magic, version, mark, *stored_key = SNAPSHOT_HEADER.unpack_from(view)
+        if (magic, version, mark, stored_key) != (SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                                  BYTE_ORDER_MARK, key):
+            return None
+
+        sections = []
+        position = SNAPSHOT_HEADER.size
+        for _ in range(len(SNAPSHOT_ARRAYS) + 2 * len(SNAPSHOT_STRINGS)):
+            length, = struct.unpack_from("=q", view, position)
+            position += 8
+            if length < 0 or position + length > len(view):
+                return None
+            sections.append(view[position:position + length])
+            position += length + (-length % 4)
+    except struct.error:
+        return None
+
+    arrays = {}
+    for name, section in zip(SNAPSHOT_ARRAYS, sections):
+        arrays[name] = section.cast("i")
+    sections = sections[len(SNAPSHOT_ARRAYS):]
+    for i, name in enumerate(SNAPSHOT_STRINGS):
+        arrays[name] = StringTable(sections[2 * i].cast("i"), sections[2 * i + 1])
+    return Graph(**arrays)
@@ -1,10 +1,17 @@
+import heapq
+import itertools
+import re
 import sys
+import time
+
+from collections import deque
 
 class Node():
-    def __init__(self, state, parent, action):
+    def __init__(self, state, parent, action, cost=0):
         self.state = state
         self.parent = parent
         self.action = action
+        self.cost = cost
 
 
 class StackFrontier():
@@ -39,44 +46,176 @@ class QueueFrontier(StackFrontier):
             self.frontier = self.frontier[1:]
             return node
 
+
+class DequeStackFrontier():
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.take()
+            self.forget(node.state)
+            return node
+
+    def take(self):
+        return self.frontier.pop()
+
+    def improves(self, node):
+        return False
+
+    def forget(self, state):
+        if self.states[state] == 1:
+            del self.states[state]
+        else:
+            self.states[state] -= 1
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def take(self):
+        return self.frontier.popleft()
+
+
+class PriorityFrontier():
+    """
+    Frontier that always removes the node with the lowest priority,
+    as given by `priority(node)`. A state already in the frontier is
+    replaced when it is added again with a lower path cost.
+    """
+    def __init__(self, priority):
+        self.priority = priority
+        self.frontier = []
+        self.costs = {}
+        self.counter = itertools.count()
+
+    def add(self, node):
+        self.costs[node.state] = node.cost
+        # The counter breaks ties in insertion order, without comparing nodes
+        heapq.heappush(self.frontier, (self.priority(node), next(self.counter), node))
+
+    def contains_state(self, state):
+        return state in self.costs
+
+    def improves(self, node):
+        return node.cost < self.costs[node.state]
+
+    def empty(self):
+        return len(self.costs) == 0
+
+    def remove(self):
+        while self.frontier:
+            _, _, node = heapq.heappop(self.frontier)
+
+            # Skip entries that were replaced by a cheaper path
+            if self.costs.get(node.state) == node.cost:
+                del self.costs[node.state]
+                return node
+        raise Exception("empty frontier")
+
+
+class WallGrid():
+    """
+    Walls of a maze packed one bit per cell, most significant bit
+    first, with each row padded to a whole number of bytes. This is
+    the layout of a PIL "1" image, so it can be rendered directly.
+    """
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.stride = (width + 7) // 8
+        self.bits = bytearray(self.stride * height)
+
+    @staticmethod
+    def pack_row(line):
+        """Packs a line of maze text into as few bytes as it needs,
+        where anything other than a space, A or B is a wall."""
+        if not line:
+            return b""
+        line = re.sub(r"[^ AB]", "1", line).translate(OPEN_CELLS)
+        line = line.ljust((len(line) + 7) // 8 * 8, "0")
+        return int(line, 2).to_bytes(len(line) // 8, "big")
+
+    def set_row(self, i, line):
+        """Sets row i from a line of maze text, or from a row already
+        packed into bytes. Missing cells at the end are open."""
+        if isinstance(line, str):
+            line = self.pack_row(line[:self.width])
+        self.bits[i * self.stride:i * self.stride + len(line)] = line
+        self.bits[i * self.stride + len(line):(i + 1) * self.stride] = bytes(self.stride - len(line))
+
+    def is_wall(self, i, j):
+        return self.bits[i * self.stride + (j >> 3)] >> (7 - (j & 7)) & 1 == 1
+
+    def row_walls(self, i):
+        """Returns row i as an integer whose set bits are walls, with
+        the padding past the last column, and rows outside the maze,
+        counted as walls."""
+        if not 0 <= i < self.height:
+            return (1 << (self.stride * 8)) - 1
+        row = int.from_bytes(self.bits[i * self.stride:(i + 1) * self.stride], "big")
+        return row | ((1 << (self.stride * 8 - self.width)) - 1)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, i):
+        return [self.is_wall(i, j) for j in range(self.width)]
+
+    def __iter__(self):
+        for i in range(self.height):
+            yield self[i]
+
+
+# Maps the characters of an open cell to a clear bit
+OPEN_CELLS = str.maketrans({" ": "0", "A": "0", "B": "0"})
+
+
 class Maze():
 
     def __init__(self, filename):
 
-        # Read file and set height and width of maze
+        # Read file one line at a time, packing each row of walls as it
+        # goes, so the text of the whole maze is never held in memory
+        rows = []
+        starts = 0
+        goals = 0
+        self.width = 0
         with open(filename) as f:
-            contents = f.read()
+            for i, line in enumerate(f):
+                line = line.rstrip("\n")
+                if "A" in line:
+                    self.start = (i, line.index("A"))
+                    starts += line.count("A")
+                if "B" in line:
+                    self.goal = (i, line.index("B"))
+                    goals += line.count("B")
+                self.width = max(self.width, len(line))
+                rows.append(WallGrid.pack_row(line))
 
         # Validate start and goal
-        if contents.count("A") != 1:
+        if starts != 1:
             raise Exception("maze must have exactly one start point")
-        if contents.count("B") != 1:
+        if goals != 1:
             raise Exception("maze must have exactly one goal")
 
-        # Determine height and width of maze
-        contents = contents.splitlines()
-        self.height = len(contents)
-        self.width = max(len(line) for line in contents)
-
         # Keep track of walls
-        self.walls = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                try:
-                    if contents[i][j] == "A":
-                        self.start = (i, j)
-                        row.append(False)
-                    elif contents[i][j] == "B":
-                        self.goal = (i, j)
-                        row.append(False)
-                    elif contents[i][j] == " ":
-                        row.append(False)
-                    else:
-                        row.append(True)
-                except IndexError:
-                    row.append(False)
-            self.walls.append(row)
+        self.height = len(rows)
+        self.walls = WallGrid(self.height, self.width)
+        for i, row in enumerate(rows):
+            self.walls.set_row(i, row)
 
         self.solution = None
 
@@ -111,20 +250,61 @@ class Maze():
 
         result = []
         for action, (r, c) in candidates:
-            if 0 <= r < self.height and 0 <= c < self.width and not self.walls[r][c]:
+            if 0 <= r < self.height and 0 <= c < self.width and not self.walls.is_wall(r, c):
                 result.append((action, (r, c)))
         return result
 
 
-    def solve(self):
-        """Finds a solution to maze, if one exists."""
+    def open(self, r, c):
+        """Returns True if (r, c) is inside the maze and not a wall."""
+        return 0 <= r < self.height and 0 <= c < self.width and not self.walls.is_wall(r, c)
+
+
+    def heuristic(self, state):
+        """Manhattan distance from state to the goal."""
+        return abs(state[0] - self.goal[0]) + abs(state[1] - self.goal[1])
+
+
+    def frontier(self, algorithm):
+        """Returns an empty frontier for the given search algorithm."""
+        if algorithm == "dfs":
+            return DequeStackFrontier()
+        elif algorithm == "bfs":
+            return DequeQueueFrontier()
+        elif algorithm == "greedy":
+            return PriorityFrontier(lambda node: self.heuristic(node.state))
+        elif algorithm == "astar":
+            # Among equal estimates, prefer nodes nearer the goal
+            return PriorityFrontier(lambda node: (node.cost + self.heuristic(node.state), self.heuristic(node.state)))
+        raise ValueError(f"unknown algorithm {algorithm}")
+
+
+    def solve(self, algorithm="dfs"):
+        """
+        Finds a solution to maze, if one exists, using one of the
+        algorithms in ALGORITHMS. Records the number of states explored
+        in num_explored and the time taken in solve_time.
+        """
+        started = time.perf_counter()
+        try:
+            if algorithm == "iddfs":
+                self.solve_iddfs()
+            elif algorithm == "jps":
+                self.solve_jps()
+            else:
+                self.solve_frontier(self.frontier(algorithm))
+        finally:
+            self.solve_time = time.perf_counter() - started
+
+
+    def solve_frontier(self, frontier):
+        """Finds a solution to maze by searching with the given frontier."""
 
         # Keep track of number of states explored
         self.num_explored = 0
 
         # Initialize frontier to just the starting position
         start = Node(state=self.start, parent=None, action=None)
-        frontier = StackFrontier()
         frontier.add(start)
 
         # Initialize an empty explored set
@@ -143,15 +323,7 @@ class Maze():
 
             # If node is the goal, then we have a solution
             if node.state == self.goal:
-                actions = []
-                cells = []
-                while node.parent is not None:
-                    actions.append(node.action)
-                    cells.append(node.state)
-                    node = node.parent
-                actions.reverse()
-                cells.reverse()
-                self.solution = (actions, cells)
+                self.solution = self.backtrack(node)
                 return
 
             # Mark node as explored
@@ -159,71 +331,302 @@ class Maze():
 
             # Add neighbors to frontier
             for action, state in self.neighbors(node.state):
-                if not frontier.contains_state(state) and state not in self.explored:
-                    child = Node(state=state, parent=node, action=action)
+                if state in self.explored:
+                    continue
+                child = Node(state=state, parent=node, action=action, cost=node.cost + 1)
+                if not frontier.contains_state(state) or frontier.improves(child):
                     frontier.add(child)
 
 
-    def output_image(self, filename, show_solution=True, show_explored=False):
-        from PIL import Image, ImageDraw
-        cell_size = 50
-        cell_border = 2
+    def solve_iddfs(self):
+        """
+        Finds a solution to maze by iterative deepening: depth-limited
+        depth-first searches with a growing limit, so the path found is
+        a shortest one.
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.width * cell_size, self.height * cell_size),
-            "black"
-        )
-        draw = ImageDraw.Draw(img)
+        Each round keeps the shallowest depth it reached every state at,
+        so a state is only expanded again when reached by a shorter path.
+        Without that, open areas would take exponential time. Memory is
+        therefore proportional to the reachable cells, as for BFS, not
+        to the path length as in textbook IDDFS.
+        """
+        self.num_explored = 0
+        self.explored = set()
 
-        solution = self.solution[1] if self.solution is not None else None
-        for i, row in enumerate(self.walls):
-            for j, col in enumerate(row):
+        for limit in range(self.height * self.width):
 
-                # Walls
-                if col:
-                    fill = (40, 40, 40)
+            # Shallowest depth each state was reached at in this round
+            depths = {self.start: 0}
+            frontier = [Node(state=self.start, parent=None, action=None)]
+            cut_off = False
 
-                # Start
-                elif (i, j) == self.start:
-                    fill = (255, 0, 0)
+            while frontier:
+                node = frontier.pop()
+                self.num_explored += 1
+                self.explored.add(node.state)
 
-                # Goal
-                elif (i, j) == self.goal:
-                    fill = (0, 171, 28)
+                if node.state == self.goal:
+                    self.solution = self.backtrack(node)
+                    return
 
-                # Solution
-                elif solution is not None and show_solution and (i, j) in solution:
-                    fill = (220, 235, 113)
+                if node.cost == limit:
+                    cut_off = True
+                    continue
 
-                # Explored
-                elif solution is not None and show_explored and (i, j) in self.explored:
-                    fill = (212, 97, 85)
+                for action, state in self.neighbors(node.state):
+                    if depths.get(state, limit + 1) > node.cost + 1:
+                        depths[state] = node.cost + 1
+                        frontier.append(Node(state=state, parent=node, action=action, cost=node.cost + 1))
 
-                # Empty cell
-                else:
-                    fill = (237, 240, 252)
+            # Every reachable state was within the limit, so no path exists
+            if not cut_off:
+                break
+
+        raise Exception("no solution")
+
+
+    def solve_jps(self):
+        """
+        Finds a shortest solution to maze with Jump Point Search.
+
+        Paths are restricted to a canonical form in which a horizontal
+        move only turns vertical when the cell diagonally behind is a
+        wall (otherwise turning one step earlier is as short). Straight
+        runs are then skipped over in one jump, and only the jump points
+        where the path may turn are added to an A* frontier.
+        """
+        self.num_explored = 0
+        self.explored = set()
+        self.prepare_rows()
+
+        # States are (cell, direction the cell was entered in)
+        start = Node(state=(self.start, None), parent=None, action=None)
+        frontier = PriorityFrontier(lambda node: (node.cost + self.heuristic(node.state[0]), self.heuristic(node.state[0])))
+        frontier.add(start)
+        closed = set()
+
+        while not frontier.empty():
+            node = frontier.remove()
+            self.num_explored += 1
+            cell, direction = node.state
+
+            if cell == self.goal:
+                self.solution = self.expand_jumps(node)
+                return
+
+            closed.add(node.state)
+            self.explored.add(cell)
+
+            for dr, dc in self.jump_directions(cell, direction):
+                jump = self.jump(cell, dr, dc)
+                if jump is None or (jump, (dr, dc)) in closed:
+                    continue
+                cost = node.cost + abs(jump[0] - cell[0]) + abs(jump[1] - cell[1])
+                child = Node(state=(jump, (dr, dc)), parent=node, action=None, cost=cost)
+                if not frontier.contains_state(child.state) or frontier.improves(child):
+                    frontier.add(child)
 
-                # Draw cell
-                draw.rectangle(
-                    ([(j * cell_size + cell_border, i * cell_size + cell_border),
-                      ((j + 1) * cell_size - cell_border, (i + 1) * cell_size - cell_border)]),
-                    fill=fill
-                )
+        raise Exception("no solution")
+
+
+    def prepare_rows(self):
+        """
+        Computes, for every row, an integer of its walls and integers
+        of the cells where a rightward or leftward move has a forced
+        vertical turn, for jump_row to search with masks and shifts.
+        """
+        bits = self.walls.stride * 8
+        full = (1 << bits) - 1
+
+        # A wall past the left edge stops leftward jumps
+        self.row_walls = [self.walls.row_walls(r) | (1 << bits) for r in range(self.height)]
+        self.forced = {1: [], -1: []}
+        for r in range(self.height):
+
+            # Forced turns: the cell above or below is open, and the
+            # one diagonally behind it is a wall
+            right = left = 0
+            for side in [self.walls.row_walls(r - 1), self.walls.row_walls(r + 1)]:
+                right |= ~side & full & (side >> 1)
+                left |= ~side & full & (side << 1)
+
+            # The goal always stops a jump
+            if self.goal[0] == r:
+                right |= 1 << (bits - 1 - self.goal[1])
+                left |= 1 << (bits - 1 - self.goal[1])
+            self.forced[1].append(right)
+            self.forced[-1].append(left)
+
+
+    def jump_directions(self, cell, direction):
+        """Returns the directions worth searching from a jump point."""
+        if direction is None:
+            return JPS_DIRECTIONS
+        dr, dc = direction
+
+        # Entered vertically: go on, or turn either way
+        if dc == 0:
+            return [(dr, 0), (0, -1), (0, 1)]
+
+        # Entered horizontally: go on, or turn only where forced
+        r, c = cell
+        directions = [(0, dc)]
+        for side in [-1, 1]:
+            if self.open(r + side, c) and not self.open(r + side, c - dc):
+                directions.append((side, 0))
+        return directions
+
+
+    def jump(self, cell, dr, dc):
+        """
+        Moves from cell in direction (dr, dc) until reaching the goal or
+        a jump point, returning it, or None on hitting a wall.
+        """
+        if dr == 0:
+            return self.jump_row(cell[0], cell[1], dc)
+
+        # Vertical: stop if either horizontal run leads anywhere
+        r, c = cell
+        while True:
+            r += dr
+            if not 0 <= r < self.height or self.walls.is_wall(r, c):
+                return None
+            if (r, c) == self.goal:
+                return (r, c)
+            if self.jump_row(r, c, -1) is not None or self.jump_row(r, c, 1) is not None:
+                return (r, c)
+
+
+    def jump_row(self, r, c, dc):
+        """
+        Horizontal jump from (r, c) in direction dc. It stops where a
+        vertical turn is forced, or at the goal, found by shifting and
+        masking whole rows of the bit grid as integers rather than by
+        stepping through the cells.
+        """
+        # Bit b of a row holds column bits - 1 - b
+        bits = self.walls.stride * 8
+        pos = bits - 1 - c
+        walls = self.row_walls[r]
+        forced = self.forced[dc][r]
+
+        if dc == 1:
+            ahead = (1 << pos) - 1
+            stop = (forced & ahead).bit_length() - 1
+            wall = (walls & ahead).bit_length() - 1
+            if stop < 0 or wall >= stop:
+                return None
+        else:
+            forced >>= pos + 1
+            walls >>= pos + 1
+            stop = (forced & -forced).bit_length() - 1
+            wall = (walls & -walls).bit_length() - 1
+            if stop < 0 or wall <= stop:
+                return None
+            stop += pos + 1
+        return (r, bits - 1 - stop)
+
+
+    def expand_jumps(self, node):
+        """Returns the (actions, cells) that lead to node, filling in the
+        cells between consecutive jump points."""
+        actions = []
+        cells = []
+        while node.parent is not None:
+            (r, c), (dr, dc) = node.state
+            origin = node.parent.state[0]
+            while (r, c) != origin:
+                actions.append(JPS_ACTIONS[(dr, dc)])
+                cells.append((r, c))
+                r -= dr
+                c -= dc
+            node = node.parent
+        actions.reverse()
+        cells.reverse()
+        return (actions, cells)
+
+
+    def backtrack(self, node):
+        """Returns the (actions, cells) that lead to node."""
+        actions = []
+        cells = []
+        while node.parent is not None:
+            actions.append(node.action)
+            cells.append(node.state)
+            node = node.parent
+        actions.reverse()
+        cells.reverse()
+        return (actions, cells)
+
+
+    def output_image(self, filename, show_solution=True, show_explored=False):
+        """
+        Saves an image of the maze. The walls are pasted straight from
+        the bit grid at one pixel per cell, the explored and solution
+        cells are set on top, and the result is scaled up, so no Python
+        work is done per empty cell. Very large mazes get smaller cells.
+        """
+        from PIL import Image, ImageDraw
+        cell_size = max(1, min(50, MAX_IMAGE_SIZE // max(self.width, self.height, 1)))
+        cell_border = 2 if cell_size >= 10 else 0
+
+        # One pixel per cell, coloured by palette index
+        img = Image.new("P", (self.width, self.height), EMPTY)
+        img.putpalette([channel for color in PALETTE for channel in color])
+        walls = Image.frombytes("1", (self.width, self.height), bytes(self.walls.bits))
+        img.paste(WALL, mask=walls)
+
+        # Later cells take precedence, but never over walls
+        cells = []
+        if self.solution is not None and show_explored:
+            cells.extend((cell, EXPLORED) for cell in self.explored)
+        if self.solution is not None and show_solution:
+            cells.extend((cell, SOLUTION) for cell in self.solution[1])
+        cells.extend([(self.start, START), (self.goal, GOAL)])
+        for (i, j), color in cells:
+            if not self.walls.is_wall(i, j):
+                img.putpixel((j, i), color)
+
+        # Scale up, then cut the gaps between cells
+        img = img.resize((self.width * cell_size, self.height * cell_size), Image.NEAREST)
+        img = img.convert("RGBA")
+        if cell_border:
+            draw = ImageDraw.Draw(img)
+            for i in range(self.height + 1):
+                y = i * cell_size
+                draw.rectangle([(0, y - cell_border + 1), (img.width, y + cell_border - 1)], fill="black")
+            for j in range(self.width + 1):
+                x = j * cell_size
+                draw.rectangle([(x - cell_border + 1, 0), (x + cell_border - 1, img.height)], fill="black")
 
         img.save(filename)
 
 
-if len(sys.argv) != 2:
-    sys.exit("Usage: python maze.py maze.txt")
+# Directions searched from the start by solve_jps, and their actions
+JPS_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+JPS_ACTIONS = {(-1, 0): "up", (1, 0): "down", (0, -1): "left", (0, 1): "right"}
+
+# Palette indexes and colors used by Maze.output_image
+EMPTY, WALL, START, GOAL, SOLUTION, EXPLORED = range(6)
+PALETTE = [(237, 240, 252), (40, 40, 40), (255, 0, 0), (0, 171, 28), (220, 235, 113), (212, 97, 85)]
+
+# Largest width or height of an output image, in pixels
+MAX_IMAGE_SIZE = 10000
+
+
+ALGORITHMS = ["dfs", "bfs", "greedy", "astar", "iddfs", "jps"]
+
+if len(sys.argv) not in [2, 3] or (len(sys.argv) == 3 and sys.argv[2] not in ALGORITHMS):
+    sys.exit(f"Usage: python maze.py maze.txt [{'|'.join(ALGORITHMS)}]")
+algorithm = sys.argv[2] if len(sys.argv) == 3 else "dfs"
 
 m = Maze(sys.argv[1])
 print("Maze:")
 m.print()
-print("Solving...")
-m.solve()
+print(f"Solving with {algorithm}...")
+m.solve(algorithm)
 print("States Explored:", m.num_explored)
+print(f"Time: {m.solve_time:.4f}s")
 print("Solution:")
 m.print()
 m.output_image("maze.png", show_explored=True)
@@ -0,0 +1,214 @@
+"""
+Tic Tac Toe Player on bitboards
+
+The same functions as the tictactoe module, for an immutable Board
+that holds each player's pieces as a 9-bit mask (bit 3 * i + j for
+cell (i, j)), so moves, win checks and hashing are integer operations.
+Board.from_lists and Board.to_lists convert to and from the
+list-of-lists boards used by runner.py.
+"""
+
+from tictactoe import X, O, EMPTY
+
+# Cell (i, j) is bit 3 * i + j
+BITS = [1 << i for i in range(9)]
+FULL = (1 << 9) - 1
+
+# Rows, columns and diagonals
+WIN_MASKS = [0b000000111, 0b000111000, 0b111000000,
+             0b001001001, 0b010010010, 0b100100100,
+             0b100010001, 0b001010100]
+
+
+class Board():
+    """
+    Immutable tic-tac-toe board of X and O bitmasks.
+    """
+    __slots__ = ("x", "o")
+
+    def __init__(self, x=0, o=0):
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "o", o)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Board is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.x == other.x and self.o == other.o
+
+    def __hash__(self):
+        return (self.x << 9) | self.o
+
+    def __repr__(self):
+        return f"Board({self.x:#011b}, {self.o:#011b})"
+
+    def __getitem__(self, i):
+        """Returns row i as a tuple of X, O and EMPTY."""
+        return tuple(self.cell(i, j) for j in range(3))
+
+    def __len__(self):
+        return 3
+
+    def cell(self, i, j):
+        bit = BITS[3 * i + j]
+        if self.x & bit:
+            return X
+        if self.o & bit:
+            return O
+        return EMPTY
+
+    @classmethod
+    def from_lists(cls, board):
+        """Returns the Board for a list-of-lists board."""
+        x = 0
+        o = 0
+        for i in range(3):
+            for j in range(3):
+                if board[i][j] == X:
+                    x |= BITS[3 * i + j]
+                elif board[i][j] == O:
+                    o |= BITS[3 * i + j]
+        return cls(x, o)
+
+    def to_lists(self):
+        """Returns the list-of-lists board for this Board."""
+        return [list(self[i]) for i in range(3)]
+
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return Board()
+
+
+def player(board):
+    """
+    Returns player who has the next turn on a board.
+    """
+    return X if board.x.bit_count() <= board.o.bit_count() else O
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    occupied = board.x | board.o
+    return {divmod(i, 3) for i in range(9) if not occupied & BITS[i]}
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board.
+    """
+    if action is None:
+        raise ValueError("Action cannot be None")
+    i, j = action
+    if not (0 <= i < 3 and 0 <= j < 3):
+        raise ValueError("Action coordinates out of bounds")
+    bit = BITS[3 * i + j]
+    if (board.x | board.o) & bit:
+        raise ValueError("Invalid action: Cell is not empty")
+
+    if player(board) == X:
+        return Board(board.x | bit, board.o)
+    return Board(board.x, board.o | bit)
+
+
+def wins(bits):
+    """
+    Returns True if the mask holds a whole row, column or diagonal.
+    """
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def winner(board):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if wins(board.x):
+        return X
+    if wins(board.o):
+        return O
+    return None
+
+
+def terminal(board):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return (board.x | board.o) == FULL or wins(board.x) or wins(board.o)
+
+
+def utility(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    if wins(board.x):
+        return 1
+    elif wins(board.o):
+        return -1
+    return 0
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board.
+
+    A full minimax search like tictactoe's original one, but over the
+    two masks directly, so no board is built for any node.
+    """
+    if terminal(board):
+        return None
+
+    x, o = board.x, board.o
+    x_turn = player(board) == X
+    best_action = None
+    best = None
+    for i in range(9):
+        bit = BITS[i]
+        if (x | o) & bit:
+            continue
+        if x_turn:
+            v = value(x | bit, o, False)
+            if best is None or v > best:
+                best, best_action = v, divmod(i, 3)
+        else:
+            v = value(x, o | bit, True)
+            if best is None or v < best:
+                best, best_action = v, divmod(i, 3)
+    return best_action
+
+
+def value(x, o, x_turn):
+    """
+    Returns the minimax value of the position with masks x and o.
+    """
+    # Only the player who just moved can have won
+    last = o if x_turn else x
+    for mask in WIN_MASKS:
+        if last & mask == mask:
+            return -1 if x_turn else 1
+
+    occupied = x | o
+    if occupied == FULL:
+        return 0
+
+    if x_turn:
+        best = -1
+        for bit in BITS:
+            if not occupied & bit:
+                v = value(x | bit, o, False)
+                if v > best:
+                    best = v
+    else:
+        best = 1
+        for bit in BITS:
+            if not occupied & bit:
+                v = value(x, o | bit, True)
+                if v < best:
+                    best = v
+    return best
@@ -0,0 +1,343 @@
+"""
+m,n,k Game Player
+
+Tic-tac-toe generalised to a board of any size, where the first player
+to get k in a row wins (3,3,3 is tic-tac-toe, 15,15,5 is gomoku). A
+Game has the same functions as the tictactoe module, so runner.py can
+play either.
+"""
+
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time for a move runs out."""
+
+
+class Game():
+
+    # So a Game can stand in for the tictactoe module in runner.py
+    X = X
+    O = O
+    EMPTY = EMPTY
+
+    def __init__(self, rows=3, cols=3, k=3, time_limit=1.0):
+        """
+        Creates a game on a `rows` x `cols` board, won by `k` in a row,
+        where the AI spends at most about `time_limit` seconds a move.
+        """
+        if min(rows, cols, k) < 1 or k > max(rows, cols):
+            raise ValueError("invalid board size or win length")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.time_limit = time_limit
+
+        # Bitboards have a spare column at the end of each row, which is
+        # always empty, so shifting along a row or diagonal never wraps
+        self.stride = cols + 1
+        self.directions = [1, self.stride, self.stride + 1, self.stride - 1]
+        self.full = 0
+        for i in range(rows):
+            for j in range(cols):
+                self.full |= self.bit(i, j)
+
+        # Every line of k cells that could still be won, for evaluate
+        self.windows = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                    if 0 <= i + di * (k - 1) < rows and 0 <= j + dj * (k - 1) < cols:
+                        window = 0
+                        for step in range(k):
+                            window |= self.bit(i + di * step, j + dj * step)
+                        self.windows.append(window)
+
+        # The windows through each cell, to update scores move by move
+        self.cell_windows = {}
+        for window in self.windows:
+            bits = window
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                self.cell_windows.setdefault(bit, []).append(window)
+
+        # Score of a line holding only one player's pieces, by count
+        self.line_scores = [0] + [10 ** count for count in range(k)]
+        self.win_score = 10 ** (k + 4)
+
+    def bit(self, i, j):
+        return 1 << (i * self.stride + j)
+
+    def cell(self, bit):
+        index = bit.bit_length() - 1
+        return (index // self.stride, index % self.stride)
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.cols for _ in range(self.rows)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x_count = sum(row.count(X) for row in board)
+        o_count = sum(row.count(O) for row in board)
+        return X if x_count <= o_count else O
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        return {(i, j) for i in range(self.rows) for j in range(self.cols)
+                if board[i][j] == EMPTY}
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        if action is None:
+            raise ValueError("Action cannot be None")
+        i, j = action
+        if not (0 <= i < self.rows and 0 <= j < self.cols):
+            raise ValueError("Action coordinates out of bounds")
+        if board[i][j] is not EMPTY:
+            raise ValueError("Invalid action: Cell is not empty")
+
+        board_copy = [row[:] for row in board]
+        board_copy[i][j] = self.player(board)
+        return board_copy
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = self.bitboards(board)
+        if self.won(x):
+            return X
+        if self.won(o):
+            return O
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        x, o = self.bitboards(board)
+        return self.won(x) or self.won(o) or (x | o) == self.full
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        winner = self.winner(board)
+        if winner == X:
+            return 1
+        elif winner == O:
+            return -1
+        return 0
+
+    def minimax(self, board):
+        """
+        Returns the best action found for the current player on the board.
+
+        Runs alpha-beta searches of increasing depth until the time limit,
+        and plays the best move of the deepest search that finished.
+        Moves are ordered by a history heuristic, and positions at the
+        depth limit are scored by evaluate.
+        """
+        if self.terminal(board):
+            return None
+
+        x, o = self.bitboards(board)
+        me, opponent = (x, o) if self.player(board) == X else (o, x)
+
+        self.deadline = time.perf_counter() + self.time_limit
+        self.nodes = 0
+        self.history = {}
+        self.transpositions = {}
+
+        best_move = None
+        score = self.evaluate(me, opponent)
+        empty = (self.full & ~(me | opponent)).bit_count()
+        for depth in range(1, empty + 1):
+            try:
+                # Always finish depth 1, so there is a move to play
+                value, move = self.search(me, opponent, depth, -self.win_score * 2,
+                                          self.win_score * 2, 0, score, timed=depth > 1)
+            except SearchTimeout:
+                break
+            best_move = move
+
+            # Stop once the result of the game is known
+            if abs(value) > self.win_score // 2:
+                break
+
+        return self.cell(best_move)
+
+    def search(self, me, opponent, depth, alpha, beta, ply, score, timed=True):
+        """
+        Negamax alpha-beta search, with `me` to move and `score` the
+        heuristic value of the position for `me`. Returns the value of
+        the position for `me` and the best move found, as a bit.
+        """
+        self.nodes += 1
+        if timed and self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        # The opponent just moved, so only they can have won
+        if self.won(opponent):
+            return -(self.win_score - ply), None
+        if (me | opponent) == self.full:
+            return 0, None
+        if depth == 0:
+            return score, None
+
+        # Bounds from an earlier search of this position, at least as deep
+        key = (me, opponent)
+        entry = self.transpositions.get(key)
+        hint = None
+        if entry is not None:
+            entry_depth, value, bound, hint = entry
+            if entry_depth >= depth and (
+                bound == "exact" or (bound == "lower" and value >= beta)
+                or (bound == "upper" and value <= alpha)
+            ):
+                return value, hint
+
+        original_alpha = alpha
+        best_value = -self.win_score * 2
+        best_move = None
+        for move in self.ordered_moves(me, opponent, hint):
+            child_score = -(score + self.move_score(me, opponent, move))
+            value, _ = self.search(opponent, me | move, depth - 1, -beta, -alpha, ply + 1,
+                                   child_score, timed)
+            value = -value
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.history[move] = self.history.get(move, 0) + depth * depth
+                break
+
+        if best_value <= original_alpha:
+            bound = "upper"
+        elif best_value >= beta:
+            bound = "lower"
+        else:
+            bound = "exact"
+        self.transpositions[key] = (depth, best_value, bound, best_move)
+        return best_value, best_move
+
+    def ordered_moves(self, me, opponent, hint):
+        """
+        Returns the moves worth searching, best first: the move that was
+        best here before, then moves that caused cutoffs elsewhere, then
+        moves nearest the centre.
+
+        On boards of more than 25 cells, only cells within two steps of
+        a piece are considered.
+        """
+        occupied = me | opponent
+        candidates = self.full & ~occupied
+        if occupied and self.rows * self.cols > 25:
+            near = self.grow(self.grow(occupied))
+            candidates &= near
+
+        moves = []
+        while candidates:
+            move = candidates & -candidates
+            candidates ^= move
+            moves.append(move)
+
+        if not moves:
+            moves = [self.bit(self.rows // 2, self.cols // 2)]
+
+        center = ((self.rows - 1) / 2, (self.cols - 1) / 2)
+
+        def priority(move):
+            i, j = self.cell(move)
+            distance = abs(i - center[0]) + abs(j - center[1])
+            return (move != hint, -self.history.get(move, 0), distance)
+
+        moves.sort(key=priority)
+        return moves
+
+    def grow(self, bits):
+        """
+        Returns bits together with every cell next to one of them.
+        """
+        grown = bits
+        for d in self.directions:
+            grown |= (bits << d) | (bits >> d)
+        return grown & self.full
+
+    def evaluate(self, me, opponent):
+        """
+        Heuristic value of a position for `me`: every line of k cells
+        holding only one player's pieces scores for that player, by a
+        factor of ten for each piece in it.
+        """
+        score = 0
+        scores = self.line_scores
+        for window in self.windows:
+            mine = me & window
+            theirs = opponent & window
+            if mine and not theirs:
+                score += scores[mine.bit_count()]
+            elif theirs and not mine:
+                score -= scores[theirs.bit_count()]
+        return score
+
+    def move_score(self, me, opponent, move):
+        """
+        Returns the change in evaluate for `me` when `me` plays `move`,
+        looking only at the lines through that cell.
+        """
+        scores = self.line_scores
+        change = 0
+        for window in self.cell_windows[move]:
+            theirs = opponent & window
+            if theirs:
+                # The line was only the opponent's, and is now dead
+                if not me & window:
+                    change += scores[theirs.bit_count()]
+            else:
+                count = (me & window).bit_count()
+                change += scores[count + 1] - scores[count]
+        return change
+
+    def won(self, bits):
+        """
+        Returns True if `bits` has k in a row in any direction.
+        """
+        for d in self.directions:
+            run = bits
+            for _ in range(self.k - 1):
+                run &= run >> d
+                if not run:
+                    break
+            if run:
+                return True
+        return False
+
+    def bitboards(self, board):
+        """
+        Returns (X bits, O bits) for a list-of-lists board.
+        """
+        x = 0
+        o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= self.bit(i, j)
+                elif cell == O:
+                    o |= self.bit(i, j)
+        return x, o
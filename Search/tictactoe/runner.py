@@ -4,6 +4,13 @@ import time
 
 import tictactoe as ttt
 
+# Optionally play on a bigger board: python runner.py rows cols k
+if len(sys.argv) == 4:
+    import mnk
+    ttt = mnk.Game(*(int(arg) for arg in sys.argv[1:]))
+elif len(sys.argv) != 1:
+    sys.exit("Usage: python runner.py [rows cols k]")
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,12 +22,16 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
 user = None
 board = ttt.initial_state()
 ai_turn = False
 
+# Size tiles to fit the board on screen
+rows, cols = len(board), len(board[0])
+tile_size = min(80, int((height - 80) / rows), int(width / cols))
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", int(tile_size * 3 / 4))
+
 while True:
 
     for event in pygame.event.get():
@@ -67,13 +78,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (cols / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(cols):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -122,8 +132,8 @@ while True:
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(rows):
+                for j in range(cols):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
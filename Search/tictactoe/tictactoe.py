@@ -4,13 +4,50 @@ Tic Tac Toe Player
 
 # https://submit.cs50.io/check50/ca39412a8b1cedd9162d701288ce87ad2b154dd2
 
-import copy
 import math
+import os
+import sys
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Rows, columns and diagonals of a board flattened to 9 cells
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8),
+         (0, 3, 6), (1, 4, 7), (2, 5, 8),
+         (0, 4, 8), (2, 4, 6)]
+
+# The 8 rotations and reflections of the board, as the flattened
+# cell each cell of the transformed board is taken from
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),
+]
+
+# Center, then corners, then edges: strong moves first prune the most
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# Bound types of a transposition table entry
+EXACT, LOWER, UPPER = range(3)
+
+# Maps canonical positions to (value, bound type), kept between moves
+transpositions = {}
+
+# Perfect-play table for every reachable position, built by build_table
+# and saved to TABLE_FILE. Position `index_of(cells)` holds
+# move * 3 + value + 1, or NO_ENTRY for finished or unreachable games.
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.table")
+TABLE_MAGIC = b"TTT1"
+NO_ENTRY = 255
+CELL_CODES = {EMPTY: 0, ".": 0, X: 1, O: 2}
+table = None
+
 
 def initial_state():
     """
@@ -77,7 +114,7 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    board_copy = copy.deepcopy(board)
+    board_copy = [row[:] for row in board]
     current_player = player(board)
 
     if action is None:
@@ -162,47 +199,227 @@ def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
+    entry = load_table()[index_of(cell for row in board for cell in row)]
+    if entry != NO_ENTRY:
+        return divmod(entry // 3, 3)
+
+    # Not in the table, so the game is over or the board is not one
+    # that can come up in play: search it instead
+    if terminal(board):
+        return None
+
+    cells = "".join(cell or "." for row in board for cell in row)
+    i, _ = best_move(cells, player(board))
+    return (i // 3, i % 3)
+
+
+def best_move(cells, current_player):
+    """
+    Returns the (cell index, value) of the first best move in the
+    position given by `cells`, as for position_value.
+    """
+    # Alpha-beta over the root moves, keeping the first best one
+    best_index = None
+    alpha = -math.inf
+    beta = math.inf
+    for i in MOVE_ORDER:
+        if cells[i] != ".":
+            continue
+        child = cells[:i] + current_player + cells[i + 1:]
+        v = position_value(child, O if current_player == X else X, alpha, beta)
+        if current_player == X and v > alpha:
+            alpha = v
+            best_index = i
+        elif current_player == O and v < beta:
+            beta = v
+            best_index = i
+
+    return best_index, alpha if current_player == X else beta
+
+
+def index_of(cells):
+    """
+    Returns the table index of a position, reading its 9 cells as
+    the digits of a base 3 number.
+    """
+    index = 0
+    for cell in cells:
+        index = index * 3 + CELL_CODES[cell]
+    return index
 
-    # Max Value function
-    def max_value(board):
+
+def reachable_positions():
+    """
+    Returns the set of every position that can come up in a game,
+    as strings of X, O and ".", finished games included.
+    """
+    positions = set()
+    stack = ["." * 9]
+    while stack:
+        cells = stack.pop()
+        if cells in positions:
+            continue
+        positions.add(cells)
+        board = [[None if c == "." else c for c in cells[i:i + 3]] for i in range(0, 9, 3)]
         if terminal(board):
-            return utility(board)
-        v = -math.inf
-        for action in actions(board):
-            v = max(v, min_value(result(board, action)))
-        return v
+            continue
+        turn = player(board)
+        for i in range(9):
+            if cells[i] == ".":
+                stack.append(cells[:i] + turn + cells[i + 1:])
+    return positions
+
 
-    # Min Value function
-    def min_value(board):
+def build_table():
+    """
+    Solves every reachable unfinished position and returns the table.
+    """
+    entries = bytearray([NO_ENTRY]) * 3 ** 9
+    for cells in reachable_positions():
+        board = [[None if c == "." else c for c in cells[i:i + 3]] for i in range(0, 9, 3)]
         if terminal(board):
-            return utility(board)
-        v = math.inf
-        for action in actions(board):
-            v = min(v, max_value(result(board, action)))
-        return v
+            continue
+        i, v = best_move(cells, player(board))
+        entries[index_of(cells)] = i * 3 + v + 1
+    return entries
 
-    best_action = None
 
-    if terminal(board):
-        return None
+def load_table():
+    """
+    Returns the table, reading it from TABLE_FILE, or building it and
+    trying to save it there if the file is missing or invalid.
+    """
+    global table
+    if table is not None:
+        return table
+
+    try:
+        with open(TABLE_FILE, "rb") as f:
+            contents = f.read()
+        if contents[:len(TABLE_MAGIC)] == TABLE_MAGIC and len(contents) == len(TABLE_MAGIC) + 3 ** 9:
+            table = contents[len(TABLE_MAGIC):]
+            return table
+    except OSError:
+        pass
+
+    table = bytes(build_table())
+    try:
+        with open(TABLE_FILE, "wb") as f:
+            f.write(TABLE_MAGIC + table)
+    except OSError:
+        pass
+    return table
+
+
+def verify_table():
+    """
+    Checks the table against full_value, a plain minimax search that
+    shares no code with best_move, for every reachable position: the
+    entry of a finished game must be empty, and any other entry must
+    hold the position's value and a move that keeps it. Returns the
+    number of positions checked and the list of those that failed.
+    """
+    entries = load_table()
+    values = {}
+    failures = []
+    checked = 0
+    for cells in reachable_positions():
+        board = [[None if c == "." else c for c in cells[i:i + 3]] for i in range(0, 9, 3)]
+        entry = entries[index_of(cells)]
+        checked += 1
+        if terminal(board):
+            if entry != NO_ENTRY:
+                failures.append(cells)
+            continue
+        if entry == NO_ENTRY:
+            failures.append(cells)
+            continue
+
+        turn = player(board)
+        i, v = divmod(entry, 3)
+        value = full_value(cells, turn, values)
+        if v - 1 != value or cells[i] != ".":
+            failures.append(cells)
+        elif full_value(cells[:i] + turn + cells[i + 1:], O if turn == X else X, values) != value:
+            failures.append(cells)
+    return checked, failures
+
+
+def full_value(cells, turn, values):
+    """
+    Returns the minimax value of a position, as for position_value, by
+    searching every move without pruning or symmetries. Values are
+    kept in `values` by exact position.
+    """
+    for a, b, c in LINES:
+        if cells[a] != "." and cells[a] == cells[b] == cells[c]:
+            return 1 if cells[a] == X else -1
+    if "." not in cells:
+        return 0
+    if cells in values:
+        return values[cells]
+
+    other = O if turn == X else X
+    children = [full_value(cells[:i] + turn + cells[i + 1:], other, values)
+                for i in range(9) if cells[i] == "."]
+    v = max(children) if turn == X else min(children)
+    values[cells] = v
+    return v
 
-    current_player = player(board)
 
-    if current_player == O:
-        min_v = math.inf
-        for action in actions(board):
-            v = max_value(result(board, action))
-            if v < min_v:
-                min_v = v
-                best_action = action
+def position_value(cells, turn, alpha, beta):
+    """
+    Returns the minimax value of a position given as a 9 character
+    string of X, O and ".", with `turn` to move, using alpha-beta
+    pruning. A value outside (alpha, beta) is only a bound on the
+    true value, as usual.
+
+    Values are cached in `transpositions` under the canonical form of
+    the position, so all 8 symmetric boards share one entry.
+    """
+    for a, b, c in LINES:
+        if cells[a] != "." and cells[a] == cells[b] == cells[c]:
+            return 1 if cells[a] == X else -1
+    if "." not in cells:
+        return 0
+
+    key = min("".join(cells[i] for i in symmetry) for symmetry in SYMMETRIES)
+    entry = transpositions.get(key)
+    if entry is not None:
+        v, bound = entry
+        if bound == EXACT or (bound == LOWER and v >= beta) or (bound == UPPER and v <= alpha):
+            return v
+
+    original_alpha, original_beta = alpha, beta
+    if turn == X:
+        v = -math.inf
+        for i in MOVE_ORDER:
+            if cells[i] == ".":
+                v = max(v, position_value(cells[:i] + X + cells[i + 1:], O, alpha, beta))
+                alpha = max(alpha, v)
+                if alpha >= beta:
+                    break
     else:
-        max_v = -math.inf
-        for action in actions(board):
-            v = min_value(result(board, action))
-            if v > max_v:
-                max_v = v
-                best_action = action
+        v = math.inf
+        for i in MOVE_ORDER:
+            if cells[i] == ".":
+                v = min(v, position_value(cells[:i] + O + cells[i + 1:], X, alpha, beta))
+                beta = min(beta, v)
+                if alpha >= beta:
+                    break
+
+    if v <= original_alpha:
+        transpositions[key] = (v, UPPER)
+    elif v >= original_beta:
+        transpositions[key] = (v, LOWER)
+    else:
+        transpositions[key] = (v, EXACT)
+    return v
 
-    return best_action
 
-    # raise NotImplementedError
+if __name__ == "__main__":
+    checked, failures = verify_table()
+    if failures:
+        sys.exit(f"Table is wrong for {len(failures)} of {checked} positions, "
+                 f"such as {failures[0]}.")
+    print(f"Table agrees with full minimax on {checked} positions.")
@@ -0,0 +1,177 @@
+import itertools
+import os
+import re
+import struct
+import sys
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# Same pattern as pagerank.crawl
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a page at a time, and the longest link tag that
+# may be split across two reads
+CHUNK_SIZE = 1 << 16
+MAX_TAG = 4096
+
+# Pages parsed together, so memory stays bounded however many there are
+PAGE_BATCH = 10000
+
+# Links file written by write_links
+LINKS_MAGIC = b"PAGELINK"
+LINKS_VERSION = 1
+LINKS_HEADER = struct.Struct("=8sIIqq")
+
+# Written in native byte order, so a file from another platform is rejected
+BYTE_ORDER_MARK = 0x01020304
+
+
+def main():
+    args = sys.argv[1:]
+    workers = 1
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit("--workers needs a number")
+        del args[i:i + 2]
+    if len(args) != 2:
+        sys.exit("Usage: python crawler.py corpus output [--workers N]")
+    pages, links = write_links(args[0], args[1], workers)
+    print(f"{pages} pages, {links} links")
+
+
+def page_links(path):
+    """
+    Return the set of links in the HTML page at `path`, reading it a
+    chunk at a time. Text from the first incomplete link tag of a chunk
+    (at most MAX_TAG characters of it) is kept for the next chunk, so a
+    tag split between reads is still found.
+    """
+    links = set()
+    with open(path) as f:
+        pending = ""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = pending + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            if not chunk:
+                return links
+            start = text.find("<a", end)
+            if start < 0:
+                start = max(end, len(text) - 1)
+            pending = text[max(start, len(text) - MAX_TAG):]
+
+
+def write_links(directory, path, workers=1):
+    """
+    Crawl the HTML pages of `directory` and write their links to
+    `path`, returning the number of pages and of links.
+
+    Pages are numbered in sorted order of their names, and links are
+    written as they are parsed, as int32 page numbers, so only the
+    names and one offset per page are kept in memory. Pages are parsed
+    by `workers` processes, PAGE_BATCH pages at a time. As in
+    pagerank.crawl, links to the page itself or to pages outside the
+    corpus are left out.
+    """
+    pages = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html")
+    )
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = array("q", [0])
+    count = 0
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers)
+        parse = executor.map
+    else:
+        executor = None
+        parse = map
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(LINKS_HEADER.pack(LINKS_MAGIC, LINKS_VERSION, BYTE_ORDER_MARK, 0, 0))
+
+            names = iter(pages)
+            while True:
+                batch = list(itertools.islice(names, PAGE_BATCH))
+                if not batch:
+                    break
+                paths = [os.path.join(directory, page) for page in batch]
+                for page, links in zip(batch, parse(page_links, paths, **chunks(workers))):
+                    targets = array("i", sorted(
+                        index[link] for link in links
+                        if link in index and link != page
+                    ))
+                    targets.tofile(f)
+                    count += len(targets)
+                    offsets.append(count)
+
+            f.write(b"\0" * (-count * 4 % 8))
+            offsets.tofile(f)
+            for page in pages:
+                f.write(page.encode("utf-8") + b"\n")
+
+            f.seek(0)
+            f.write(LINKS_HEADER.pack(LINKS_MAGIC, LINKS_VERSION, BYTE_ORDER_MARK,
+                                      len(pages), count))
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return len(pages), count
+
+
+def chunks(workers):
+    """
+    Return the keyword arguments to spread a batch across `workers`.
+    """
+    if workers > 1:
+        return {"chunksize": max(1, PAGE_BATCH // (workers * 4))}
+    return {}
+
+
+def read_links(path):
+    """
+    Return the pages and link arrays written to `path` by write_links,
+    as `pages, offsets, targets` in the form of pagerank.link_arrays,
+    with the arrays memory-mapped from the file.
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        magic, version, mark, page_count, link_count = LINKS_HEADER.unpack(
+            f.read(LINKS_HEADER.size)
+        )
+        if (magic, version, mark) != (LINKS_MAGIC, LINKS_VERSION, BYTE_ORDER_MARK):
+            raise ValueError(f"not a links file for this version and platform: {path}")
+        offsets_start = LINKS_HEADER.size + link_count * 4 + (-link_count * 4 % 8)
+        names_start = offsets_start + (page_count + 1) * 8
+        f.seek(names_start)
+        pages = f.read().decode("utf-8").split("\n")[:page_count]
+
+    if link_count:
+        targets = np.memmap(path, dtype=np.int32, mode="r",
+                            offset=LINKS_HEADER.size, shape=(link_count,))
+    else:
+        targets = np.zeros(0, dtype=np.int32)
+    offsets = np.memmap(path, dtype=np.int64, mode="r",
+                        offset=offsets_start, shape=(page_count + 1,))
+    return pages, offsets, targets
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,63 @@
 # https://submit.cs50.io/check50/fee4245a9d0a36b9e1e9ac8aee0fa8b1c514938d
 
+import bisect
 import os
 import random
-import re
 import sys
 
+from concurrent.futures import ProcessPoolExecutor
+
+from crawler import page_links
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Total change in PageRank values at which iteration stops
+TOLERANCE = 1e-6
+
+# Random surfers sampled at once, and the fewest steps each one takes
+WALKERS = 10000
+WALK_LENGTH = 1000
+
+# Surfer visits gathered before they are added to the counts
+VISIT_BUFFER = 1 << 20
+
+# Samples in each independent batch of parallel sampling, the surfers
+# taking them and the steps they take before counting, the batches
+# needed before it may stop, and the z-score of its confidence
+# intervals. Each surfer takes 250 steps, so burn-in costs under a
+# tenth of a batch and every step works on thousands of surfers.
+BATCH_SAMPLES = 1000000
+BATCH_WALKERS = 4000
+BURN_IN = 20
+MIN_BATCHES = 30
+CONFIDENCE_Z = 1.96
+
+# Confidence interval half-width at which parallel sampling stops
+SAMPLING_TOLERANCE = 0.001
+
+# Link arrays of the corpus, loaded once per sampling process
+links = None
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    args = sys.argv[1:]
+    workers = None
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit("--workers needs a number")
+        del args[i:i + 2]
+    if len(args) != 1:
+        sys.exit("Usage: python pagerank.py corpus [--workers N]")
+    corpus = crawl(args[0])
+    if workers is not None:
+        ranks, errors, n = parallel_sample_pagerank(corpus, DAMPING, workers=workers)
+        print(f"PageRank Results from Parallel Sampling (n = {n})")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f} ± {CONFIDENCE_Z * errors[page]:.4f}")
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -35,10 +80,8 @@ def crawl(directory):
     for filename in os.listdir(directory):
         if not filename.endswith(".html"):
             continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+        links = page_links(os.path.join(directory, filename))
+        pages[filename] = links - {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -135,35 +178,14 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    
-    pr_dict = dict()
-    for page in corpus:
-        pr_dict[page] = 0
-   
-    #The first sample should be generated by choosing from a page at random.
-    current_page = random.choice(list(corpus.keys()))  # Start from a random page
-    
-    # Inside sample_pagerank function
-    for i in range(n):
-        print(f"Iteration {i+1}, Current Page: {current_page}")
-        pr_dict[current_page] += 1  # Count the visit to the current page
-
-        pd = transition_model(corpus, current_page, damping_factor)
-        print(f"Transition Model Output: {pd}")
 
-        next_page = random.choices(list(pd.keys()), list(pd.values()), k=1)[0]
-        print(f"Next Page Chosen: {next_page}")
+    The samples come from walk_counts over the corpus's link arrays,
+    seeded from `random`, so they are reproducible with random.seed.
+    """
+    pages, offsets, targets = link_arrays(corpus)
+    counts = walk_counts(offsets, targets, damping_factor, n, random.getrandbits(64))
+    return dict(zip(pages, (counts / n).tolist()))
 
-        current_page = next_page  # Move to the next page for the next iteration
-
-    
-    # Normalize PageRank values to ensure they sum to 1
-    total_samples = sum(pr_dict.values())
-    for page in pr_dict:
-        pr_dict[page] /= total_samples
-    
-    return pr_dict
 
 def iterate_pagerank(corpus, damping_factor):
     """
@@ -250,6 +272,354 @@ def NumLinks(i, corpus):
     return len(corpus[i])
 
 
+def link_arrays(corpus):
+    """
+    Return the corpus as compressed sparse rows: a sorted list of the
+    pages, and NumPy arrays `offsets` and `targets`, where the pages
+    linked to by pages[i] are targets[offsets[i]:offsets[i + 1]], as
+    indexes into the list. Links to pages outside the corpus are dropped.
+    """
+    import numpy as np
+
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    counts = np.zeros(len(pages) + 1, dtype=np.int64)
+    targets = []
+    for i, page in enumerate(pages):
+        links = [index[link] for link in corpus[page] if link in index]
+        links.sort()
+        counts[i + 1] = len(links)
+        targets.extend(links)
+    offsets = np.cumsum(counts)
+    return pages, offsets, np.array(targets, dtype=np.int64)
+
+
+def sparse_pagerank(offsets, targets, damping_factor, tolerance=TOLERANCE, ranks=None):
+    """
+    Return PageRank values for the compressed sparse row graph of
+    `offsets` and `targets` (see link_arrays) by power iteration, as a
+    NumPy array, together with the number of iterations taken.
+
+    Each iteration moves every page's rank along its links at once,
+    with bincount over the links, and shares the rank of pages with no
+    links among all pages, as if they linked to every page. Iteration
+    stops once the ranks change by less than `tolerance` in total, and
+    starts from `ranks` if given, or from 1 / N for every page.
+    """
+    import numpy as np
+
+    n = len(offsets) - 1
+    out_degree = np.diff(offsets)
+    sources = np.repeat(np.arange(n), out_degree)
+    dangling = out_degree == 0
+    inverse_degree = np.zeros(n)
+    inverse_degree[~dangling] = 1 / out_degree[~dangling]
+
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    else:
+        ranks = np.asarray(ranks, dtype=float) / np.sum(ranks)
+
+    iterations = 0
+    while True:
+        iterations += 1
+        flow = np.bincount(targets, weights=(ranks * inverse_degree)[sources], minlength=n)
+        new_ranks = damping_factor * (flow + ranks[dangling].sum() / n) + (1 - damping_factor) / n
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            return ranks / ranks.sum(), iterations
+
+
+def walk_counts(offsets, targets, damping_factor, n, seed=None, walkers=WALKERS, burn_in=0):
+    """
+    Return how many of `n` samples of the random surfer land on each
+    page of the compressed sparse row graph of `offsets` and `targets`
+    (see link_arrays), as a NumPy array.
+
+    With probability `damping_factor` the surfer follows a random link
+    of its page, and otherwise, or if the page has no links, it goes to
+    a random page. Many surfers walk at once, each step one array
+    operation over all of them, so every sample takes constant time:
+    a link is picked as targets[offsets[page] + k] for a random k below
+    the page's number of links. Each surfer starts at a random page, so
+    either its first `burn_in` steps are not counted as samples, or
+    with no burn-in it takes at least WALK_LENGTH steps, so where it
+    started hardly matters.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    pages = len(offsets) - 1
+    degree = np.diff(offsets)
+    if burn_in:
+        walkers = max(1, min(walkers, n))
+    else:
+        walkers = max(1, min(walkers, n // WALK_LENGTH))
+    counts = np.zeros(pages, dtype=np.int64)
+
+    # Visits are counted VISIT_BUFFER at a time, as one bincount costs
+    # time for every page, however few surfers there are
+    buffer = np.empty(max(walkers, VISIT_BUFFER), dtype=np.int64)
+    filled = 0
+
+    current = rng.integers(0, pages, walkers)
+    remaining = n
+    while remaining > 0:
+        if burn_in > 0:
+            burn_in -= 1
+        else:
+            visits = current if remaining >= walkers else current[:remaining]
+            if filled + len(visits) > len(buffer):
+                counts += np.bincount(buffer[:filled], minlength=pages)
+                filled = 0
+            buffer[filled:filled + len(visits)] = visits
+            filled += len(visits)
+            remaining -= len(visits)
+
+        links = degree[current]
+        follow = (links > 0) & (rng.random(walkers) < damping_factor)
+        following = current[follow]
+        choice = (rng.random(len(following)) * links[follow]).astype(np.int64)
+        current = rng.integers(0, pages, walkers)
+        current[follow] = targets[offsets[following] + choice]
+    counts += np.bincount(buffer[:filled], minlength=pages)
+    return counts
+
+
+def parallel_sample_pagerank(corpus, damping_factor, tolerance=SAMPLING_TOLERANCE,
+                             workers=None, max_samples=10 ** 8, seed=None):
+    """
+    Return PageRank estimates for each page from independent batches
+    of BATCH_SAMPLES random-surfer samples, run across `workers`
+    processes, with the standard error of each estimate. Returns
+    (ranks, errors, samples), where ranks and errors are dictionaries
+    by page and samples is the number of samples taken.
+
+    Each batch has its own seed and surfers, so batches are independent
+    and the spread of their estimates gives the standard errors.
+    Sampling stops once every page's confidence interval (CONFIDENCE_Z
+    standard errors either way) is narrower than `tolerance` each way,
+    or after `max_samples`. Batches are counted in the order they were
+    started, so the result only depends on `seed`, not on `workers`.
+    """
+    import numpy as np
+
+    pages, offsets, targets = link_arrays(corpus)
+    seeds = np.random.SeedSequence(seed)
+    batches = max(MIN_BATCHES, max_samples // BATCH_SAMPLES)
+    workers = workers or os.cpu_count()
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=load_links,
+                                       initargs=(offsets, targets))
+    else:
+        executor = None
+        load_links(offsets, targets)
+
+    total = np.zeros(len(pages))
+    squares = np.zeros(len(pages))
+    count = 0
+    try:
+        pending = []
+        for batch_seed in seeds.spawn(batches):
+            if executor is None:
+                proportions = sample_batch(damping_factor, batch_seed)
+            else:
+                # Keep every worker busy, then wait for the oldest batch
+                pending.append(executor.submit(sample_batch, damping_factor, batch_seed))
+                if len(pending) < workers * 2:
+                    continue
+                proportions = pending.pop(0).result()
+
+            total += proportions
+            squares += proportions ** 2
+            count += 1
+            if count >= MIN_BATCHES:
+                errors = standard_errors(total, squares, count)
+                if CONFIDENCE_Z * errors.max() < tolerance:
+                    break
+        else:
+            for future in pending:
+                proportions = future.result()
+                total += proportions
+                squares += proportions ** 2
+                count += 1
+            pending = []
+    finally:
+        if executor is not None:
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    ranks = total / count
+    errors = standard_errors(total, squares, count)
+    return (dict(zip(pages, ranks.tolist())), dict(zip(pages, errors.tolist())),
+            count * BATCH_SAMPLES)
+
+
+def load_links(offsets, targets):
+    """
+    Load the link arrays to sample from in this process.
+    """
+    global links
+    links = (offsets, targets)
+
+
+def sample_batch(damping_factor, seed):
+    """
+    Return the proportion of BATCH_SAMPLES samples of fresh random
+    surfers, seeded with `seed`, that land on each page. The surfers
+    walk BURN_IN steps first, so the batch does not favour their
+    random starting pages, which would bias every batch alike.
+    """
+    offsets, targets = links
+    counts = walk_counts(offsets, targets, damping_factor, BATCH_SAMPLES, seed,
+                         walkers=BATCH_WALKERS, burn_in=BURN_IN)
+    return counts / BATCH_SAMPLES
+
+
+def standard_errors(total, squares, count):
+    """
+    Return the standard error of the mean of `count` batch estimates,
+    given their sum and sum of squares.
+    """
+    import numpy as np
+
+    mean = total / count
+    variance = np.maximum(squares / count - mean ** 2, 0) * count / (count - 1)
+    return np.sqrt(variance / count)
+
+
+def iterate_pagerank_sparse(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page like iterate_pagerank, but
+    computed over a sparse transition matrix built once from the
+    corpus, in time proportional to the number of links per iteration.
+    """
+    pages, offsets, targets = link_arrays(corpus)
+    ranks, _ = sparse_pagerank(offsets, targets, damping_factor, tolerance)
+    return dict(zip(pages, ranks.tolist()))
+
+
+def patch_link_arrays(pages, offsets, targets, added=(), removed=(), removed_pages=()):
+    """
+    Return `pages, offsets, targets` (see link_arrays) with the (page,
+    link) pairs of `added` linked and those of `removed` unlinked, and
+    the pages of `removed_pages` left out along with every link to
+    them, together with an array giving each old page's new index, or
+    -1 if it was removed. Pages only named in `added` become new pages,
+    and `pages` stays sorted, as link_arrays leaves it.
+
+    Only the rows of pages whose links change are rebuilt in Python;
+    the rest are copied as whole slices, and renumbered with one array
+    lookup if pages were added or removed.
+    """
+    import numpy as np
+
+    def find(page):
+        i = bisect.bisect_left(pages, page)
+        return i if i < len(pages) and pages[i] == page else None
+
+    n = len(pages)
+    removed_pages = set(removed_pages)
+    gone = sorted({i for i in map(find, removed_pages) if i is not None})
+    names = {page for pair in added for page in pair}
+    new_names = sorted(page for page in names
+                       if page in removed_pages or find(page) is None)
+
+    # Old index i moves down past removed pages and up past new ones
+    old = np.arange(n)
+    removed_at = np.array(gone, dtype=np.int64)
+    inserted_at = np.array([bisect.bisect_left(pages, page) for page in new_names],
+                           dtype=np.int64)
+    new_index = (old - np.searchsorted(removed_at, old)
+                 + np.searchsorted(inserted_at, old, side="right"))
+    new_index[gone] = -1
+
+    new_pages = list(pages)
+    for i in reversed(gone):
+        del new_pages[i]
+    for page in new_names:
+        bisect.insort(new_pages, page)
+
+    # Links renumbered, without those from or to removed pages
+    degree = np.diff(offsets)
+    if gone or new_names:
+        links = new_index[targets]
+        keep = links >= 0
+        if gone:
+            keep &= np.repeat(new_index >= 0, degree)
+        links = links[keep]
+        kept_before = np.concatenate(([0], np.cumsum(keep)))[offsets]
+        new_degree = np.zeros(len(new_pages), dtype=np.int64)
+        new_degree[new_index[new_index >= 0]] = np.diff(kept_before)[new_index >= 0]
+    else:
+        links = targets
+        new_degree = degree.astype(np.int64)
+    starts = np.concatenate(([0], np.cumsum(new_degree)))
+
+    # New links of the rows that change
+    index = {}
+
+    def position(page):
+        if page not in index:
+            i = bisect.bisect_left(new_pages, page)
+            index[page] = i if i < len(new_pages) and new_pages[i] == page else None
+        return index[page]
+
+    rows = {}
+    for pairs, add in ((removed, False), (added, True)):
+        for page, link in pairs:
+            i, j = position(page), position(link)
+            if i is None or j is None or i == j:
+                continue
+            if i not in rows:
+                rows[i] = set(links[starts[i]:starts[i + 1]].tolist())
+            if add:
+                rows[i].add(j)
+            else:
+                rows[i].discard(j)
+
+    pieces = []
+    previous = 0
+    for i in sorted(rows):
+        pieces.append(links[starts[previous]:starts[i]])
+        pieces.append(np.array(sorted(rows[i]), dtype=np.int64))
+        new_degree[i] = len(rows[i])
+        previous = i + 1
+    pieces.append(links[starts[previous]:])
+
+    new_offsets = np.concatenate(([0], np.cumsum(new_degree)))
+    new_targets = np.concatenate(pieces).astype(np.int64, copy=False)
+    return new_pages, new_offsets, new_targets, new_index
+
+
+def update_pagerank(pages, offsets, targets, ranks, damping_factor, added=(), removed=(),
+                    removed_pages=(), tolerance=TOLERANCE):
+    """
+    Return `pages, offsets, targets, ranks` for the link arrays (see
+    link_arrays) changed by a link diff (see patch_link_arrays), given
+    `ranks`, the array of PageRank values before the change.
+
+    A small change to the links only moves the ranks a little, so power
+    iteration starts from the old ranks, with 1 / N for new pages, and
+    needs only the iterations to cover that difference, rather than
+    starting again from 1 / N everywhere. The arrays are patched rather
+    than rebuilt, so only the iterations take time for every link.
+    """
+    import numpy as np
+
+    pages, offsets, targets, new_index = patch_link_arrays(
+        pages, offsets, targets, added, removed, removed_pages
+    )
+    start = np.full(len(pages), 1 / len(pages))
+    moved = new_index >= 0
+    start[new_index[moved]] = np.asarray(ranks)[moved]
+    new_ranks, _ = sparse_pagerank(offsets, targets, damping_factor, tolerance, start)
+    return pages, offsets, targets, new_ranks
+
+
 if __name__ == "__main__":
     main()
     
\ No newline at end of file